@@ -2,13 +2,41 @@
 Grocery Store Management System - Flask Backend
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, session,
+                   Response, stream_with_context, g, has_request_context, abort)
 from flask_cors import CORS
+from werkzeug.security import safe_join
 from datetime import datetime, date
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, FieldType, pooling
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image, ImageDraw, ImageFont
+import zipfile
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import decimal
+import gzip
+import hashlib
+import io
 import json
+import mimetypes
+import multiprocessing
+import os
+import pickle
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = 'grocery_store_secret_key_2024'
@@ -25,8 +53,14 @@ DB_CONFIG = {
 }
 
 def get_db_connection():
-    """Create and return database connection"""
+    """Create and return database connection.
+
+    Inside an admitted API request the connection comes from that request's
+    workload pool; elsewhere (CLI commands) a fresh connection is opened.
+    """
     try:
+        if has_request_context() and 'workload' in g:
+            return get_workload_connection(g.workload)
         conn = mysql.connector.connect(**DB_CONFIG)
         return conn
     except Error as e:
@@ -44,17 +78,818 @@ class CustomJSONEncoder(json.JSONEncoder):
 
 app.json_encoder = CustomJSONEncoder
 
+# ==================== WORKLOAD ISOLATION ====================
+
+# Each workload class gets its own concurrency limit and connection pool
+# slice, so reporting can never take the connections checkout needs.
+# Limits apply per worker process; keep pool_size >= max_concurrent.
+WORKLOAD_CONFIG = {
+    'pos': {
+        'max_concurrent': 16,
+        'pool_size': 16,
+        'queue_timeout': 5.0,           # Seconds to wait for a slot before shedding
+        'statement_timeout_ms': None
+    },
+    'default': {
+        'max_concurrent': 8,
+        'pool_size': 8,
+        'queue_timeout': 2.0,
+        'statement_timeout_ms': None
+    },
+    'reporting': {
+        'max_concurrent': 2,
+        'pool_size': 2,
+        'queue_timeout': 0,
+        'statement_timeout_ms': 5000    # MySQL MAX_EXECUTION_TIME for SELECTs
+    },
+    'batch': {
+        'max_concurrent': 1,            # Per worker; runs also take a database lock
+        'pool_size': 1,
+        'queue_timeout': 0,
+        'statement_timeout_ms': None    # Batches scan whole tables
+    }
+}
+
+# Reporting is shed while this many checkout requests are in flight
+REPORTING_SHED_POS_IN_FLIGHT = 8
+
+# Seconds clients are told to wait after being shed
+RETRY_AFTER_SECONDS = 5
+
+# API endpoint -> workload class; unlisted API endpoints are 'default'
+ENDPOINT_WORKLOADS = {
+    'create_sale': 'pos',
+    'search_products': 'pos',
+    'get_sale_receipt': 'pos',
+    'get_changes': 'pos',
+    'get_dashboard_stats': 'reporting',
+    'get_sales_report': 'reporting',
+    'get_chart_data': 'reporting',
+    'get_transactions': 'reporting',
+    'get_sales': 'reporting',
+    'get_bulk_receipts': 'reporting',
+    'get_customer_segments': 'reporting',
+    'run_customer_rfm': 'batch'
+}
+
+_workload_slots = {name: threading.BoundedSemaphore(config['max_concurrent'])
+                   for name, config in WORKLOAD_CONFIG.items()}
+_workload_stats = {name: {'in_flight': 0, 'admitted': 0, 'shed': 0}
+                   for name in WORKLOAD_CONFIG}
+_workload_lock = threading.Lock()
+_workload_pools = {}
+# Pools connect on creation, so each class builds its pool under its own
+# lock; _workload_lock only guards the counters admission touches
+_workload_pool_locks = {name: threading.Lock() for name in WORKLOAD_CONFIG}
+
+def get_workload_connection(workload):
+    """Check a connection out of a workload's pool, applying its statement time limit"""
+    pool = _workload_pools.get(workload)
+    if pool is None:
+        with _workload_pool_locks[workload]:
+            pool = _workload_pools.get(workload)
+            if pool is None:
+                pool = pooling.MySQLConnectionPool(pool_name=f'grocery_{workload}',
+                                                   pool_size=WORKLOAD_CONFIG[workload]['pool_size'],
+                                                   **DB_CONFIG)
+                _workload_pools[workload] = pool
+    
+    conn = pool.get_connection()
+    timeout = WORKLOAD_CONFIG[workload]['statement_timeout_ms']
+    if timeout:
+        # Session variables are reset when the connection returns to the pool
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (timeout,))
+        cursor.close()
+    return conn
+
+def _shed_response(workload):
+    with _workload_lock:
+        _workload_stats[workload]['shed'] += 1
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+@app.before_request
+def admit_request():
+    """Admit API requests into their workload class or shed them"""
+    if not request.path.startswith('/api/') or request.endpoint is None:
+        return None
+    
+    workload = ENDPOINT_WORKLOADS.get(request.endpoint, 'default')
+    
+    if workload == 'reporting':
+        with _workload_lock:
+            pos_busy = _workload_stats['pos']['in_flight'] >= REPORTING_SHED_POS_IN_FLIGHT
+        if pos_busy:
+            return _shed_response(workload)
+    
+    if not _workload_slots[workload].acquire(timeout=WORKLOAD_CONFIG[workload]['queue_timeout']):
+        return _shed_response(workload)
+    
+    g.workload = workload
+    with _workload_lock:
+        _workload_stats[workload]['in_flight'] += 1
+        _workload_stats[workload]['admitted'] += 1
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    """Release the request's workload slot (after streaming finishes)"""
+    workload = g.pop('workload', None)
+    if workload:
+        with _workload_lock:
+            _workload_stats[workload]['in_flight'] -= 1
+        _workload_slots[workload].release()
+
+@app.route('/api/workloads/stats')
+def get_workload_stats():
+    """Get per-workload in-flight, admitted and shed request counters"""
+    with _workload_lock:
+        stats = {name: dict(counters, max_concurrent=WORKLOAD_CONFIG[name]['max_concurrent'])
+                 for name, counters in _workload_stats.items()}
+    return jsonify(stats)
+
+# ==================== QUERY RESULT CACHE ====================
+
+# Query cache configuration. Set 'shared_path' to a local file path to let
+# every worker process on this machine share one cache.
+QUERY_CACHE_CONFIG = {
+    'max_entries': 1024,
+    'ttl': 300,
+    'shared_path': None
+}
+
+def _tags_to_drop(tags):
+    """Expand invalidation tags into the exact and prefix tags they cover.
+
+    'table'     -> table-wide query results (use after an INSERT)
+    'table:id'  -> results tagged with that row, plus table-wide results
+    'table:*'   -> every result that touches the table
+    """
+    exact, prefixes = set(), set()
+    for tag in tags:
+        table, _, row = tag.partition(':')
+        if row == '*':
+            exact.add(table)
+            prefixes.add(table + ':')
+        elif row:
+            exact.update((tag, table))
+        else:
+            exact.add(table)
+    return exact, prefixes
+
+def _generation_tags(tags):
+    """Invalidation markers that make a result with these tags stale"""
+    markers = set()
+    for tag in tags:
+        table, _, row = tag.partition(':')
+        markers.add(tag)
+        if row:
+            markers.add(table + ':*')
+    return markers
+
+class QueryCache:
+    """Bounded in-process LRU + TTL cache for read query results.
+
+    Entries are tagged with the tables (or table rows) they read so that
+    write routes can invalidate exactly the results they make stale.
+    Values are stored pickled, so callers always get their own copy.
+
+    Every invalidation bumps a generation counter and remembers it per tag.
+    Readers take generation() before querying and pass it to set(), which
+    drops the result if one of its tags was invalidated in the meantime.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tag_index = defaultdict(set)
+        self._invalidated_at = {}
+        self._generation = 0
+        self._generation_floor = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, params=()):
+        """Build a cache key from whitespace-normalised SQL and its parameters"""
+        normalised = ' '.join(query.split())
+        return hashlib.sha1(f"{normalised}|{params!r}".encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, tags, payload = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(payload)
+
+    def generation(self):
+        """Current invalidation generation, to pass to set() after the query"""
+        return self._generation
+
+    def _is_stale(self, tags, since):
+        if since is None:
+            return False
+        if since < self._generation_floor:
+            return True
+        return any(self._invalidated_at.get(marker, 0) > since
+                   for marker in _generation_tags(tags))
+
+    def set(self, key, value, tags=(), since=None):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if self._is_stale(tags, since):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(tags), payload)
+            for tag in tags:
+                self._tag_index[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        exact, prefixes = _tags_to_drop(tags)
+        with self._lock:
+            self._mark_invalidated(exact, prefixes)
+            matched = [tag for tag in self._tag_index
+                       if tag in exact or tag.startswith(tuple(prefixes))]
+            keys = set()
+            for tag in matched:
+                keys.update(self._tag_index.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def _mark_invalidated(self, exact, prefixes):
+        self._generation += 1
+        if len(self._invalidated_at) > self.max_entries * 4:
+            # Forget per-tag history; results read before now are dropped instead
+            self._invalidated_at.clear()
+            self._generation_floor = self._generation
+        for marker in exact | {prefix + '*' for prefix in prefixes}:
+            self._invalidated_at[marker] = self._generation
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def _remove(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def size(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'local',
+            'entries': self.size(),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+class SharedQueryCache(QueryCache):
+    """Query cache stored in a local SQLite file shared by all workers.
+
+    Hit/miss counters are kept per worker; entries, LRU order and
+    invalidations are shared. The file is disposable, so it is written
+    without fsync, and hits only refresh an entry's LRU timestamp once it
+    is LAST_USED_RESOLUTION seconds old, keeping most reads write-free.
+    """
+
+    LAST_USED_RESOLUTION = 30
+
+    def __init__(self, path, max_entries=1024, ttl=300):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_tags (
+                    tag TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    PRIMARY KEY (tag, cache_key)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags(cache_key)")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_invalidations (
+                    tag TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_generation (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL,
+                    floor INTEGER NOT NULL
+                )
+            """)
+            db.execute("INSERT OR IGNORE INTO cache_generation (id, generation, floor) VALUES (1, 0, 0)")
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA synchronous=OFF")
+            self._local.db = db
+        return db
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key):
+        now = time.time()
+        db = self._connect()
+        row = db.execute(
+            "SELECT payload, expires_at, last_used FROM cache_entries WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        payload, expires_at, last_used = row
+        if expires_at < now:
+            with db:
+                self._delete(db, [key])
+            self._count('expirations')
+            self._count('misses')
+            return None
+        if now - last_used > self.LAST_USED_RESOLUTION:
+            with db:
+                db.execute("UPDATE cache_entries SET last_used = ? WHERE cache_key = ?", (now, key))
+        self._count('hits')
+        return pickle.loads(payload)
+
+    def generation(self):
+        return self._connect().execute(
+            "SELECT generation FROM cache_generation WHERE id = 1").fetchone()[0]
+
+    def set(self, key, value, tags=(), since=None):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._connect() as db:
+            # The delete takes SQLite's write lock, so no invalidation can
+            # land between the staleness check and the insert
+            self._delete(db, [key])
+            if since is not None and self._is_stale_shared(db, tags, since):
+                return
+            db.execute("""
+                INSERT INTO cache_entries (cache_key, payload, expires_at, last_used)
+                VALUES (?, ?, ?, ?)
+            """, (key, payload, now + self.ttl, now))
+            db.executemany("INSERT OR IGNORE INTO cache_tags (tag, cache_key) VALUES (?, ?)",
+                           [(tag, key) for tag in tags])
+            overflow = db.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                stale = [r[0] for r in db.execute(
+                    "SELECT cache_key FROM cache_entries ORDER BY last_used LIMIT ?", (overflow,))]
+                self._delete(db, stale)
+                self._count('evictions', len(stale))
+
+    @staticmethod
+    def _is_stale_shared(db, tags, since):
+        markers = list(_generation_tags(tags))
+        floor = db.execute("SELECT floor FROM cache_generation WHERE id = 1").fetchone()[0]
+        if since < floor:
+            return True
+        if not markers:
+            return False
+        latest = db.execute(
+            f"SELECT MAX(generation) FROM cache_invalidations WHERE tag IN ({', '.join('?' * len(markers))})",
+            markers).fetchone()[0]
+        return latest is not None and latest > since
+
+    def invalidate(self, *tags):
+        exact, prefixes = _tags_to_drop(tags)
+        clauses = ['tag = ?'] * len(exact) + ['tag LIKE ?'] * len(prefixes)
+        if not clauses:
+            return
+        params = list(exact) + [prefix + '%' for prefix in prefixes]
+        markers = exact | {prefix + '*' for prefix in prefixes}
+        with self._connect() as db:
+            db.execute("UPDATE cache_generation SET generation = generation + 1 WHERE id = 1")
+            generation = db.execute(
+                "SELECT generation FROM cache_generation WHERE id = 1").fetchone()[0]
+            if db.execute("SELECT COUNT(*) FROM cache_invalidations").fetchone()[0] > self.max_entries * 4:
+                db.execute("DELETE FROM cache_invalidations")
+                db.execute("UPDATE cache_generation SET floor = ? WHERE id = 1", (generation,))
+            db.executemany("INSERT OR REPLACE INTO cache_invalidations (tag, generation) VALUES (?, ?)",
+                           [(marker, generation) for marker in markers])
+            keys = [r[0] for r in db.execute(
+                f"SELECT DISTINCT cache_key FROM cache_tags WHERE {' OR '.join(clauses)}", params)]
+            self._delete(db, keys)
+        self._count('invalidations', len(keys))
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM cache_entries")
+            db.execute("DELETE FROM cache_tags")
+
+    @staticmethod
+    def _delete(db, keys):
+        rows = [(key,) for key in keys]
+        db.executemany("DELETE FROM cache_entries WHERE cache_key = ?", rows)
+        db.executemany("DELETE FROM cache_tags WHERE cache_key = ?", rows)
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats['backend'] = 'shared'
+        return stats
+
+if QUERY_CACHE_CONFIG['shared_path']:
+    query_cache = SharedQueryCache(QUERY_CACHE_CONFIG['shared_path'],
+                                   QUERY_CACHE_CONFIG['max_entries'],
+                                   QUERY_CACHE_CONFIG['ttl'])
+else:
+    query_cache = QueryCache(QUERY_CACHE_CONFIG['max_entries'], QUERY_CACHE_CONFIG['ttl'])
+
+# Sale statuses whose invoice contents no longer change
+FINISHED_SALE_STATUSES = ('Completed', 'Refunded', 'Cancelled')
+
+def cached_fetchall(query, params=(), tags=()):
+    """Run a read query through the query cache.
+
+    Only opens a database connection on a cache miss. Returns None if the
+    database is unreachable; database errors propagate to the caller.
+    """
+    params = tuple(params)
+    key = query_cache.make_key(query, params)
+    rows = query_cache.get(key)
+    if rows is not None:
+        return rows
+
+    generation = query_cache.generation()
+    conn = get_db_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    query_cache.set(key, rows, tags, since=generation)
+    return rows
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Get query cache hit/miss/eviction counters"""
+    return jsonify(query_cache.stats())
+
+# ==================== CHANGE FEED ====================
+
+# Change feed configuration
+CHANGE_FEED_CONFIG = {
+    'page_size': 500,        # Versions returned per /api/changes call
+    'page_entries': 1000,    # Changed rows per call; larger writes span several versions
+    'retention_days': 30     # Older versions are compacted; clients behind them reload
+}
+
+# Change log entity -> (response key, id column, query for current rows)
+CHANGE_ENTITIES = {
+    'product': ('products', 'product_id', """
+        SELECT p.*, c.category_name
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.category_id
+        WHERE p.product_id IN ({ids})
+    """),
+    'category': ('categories', 'category_id', """
+        SELECT * FROM categories WHERE category_id IN ({ids})
+    """),
+    'customer': ('customers', 'customer_id', """
+        SELECT * FROM customers WHERE customer_id IN ({ids})
+    """),
+    'stock': ('stock', 'product_id', """
+        SELECT product_id, quantity FROM products WHERE product_id IN ({ids})
+    """)
+}
+
+def record_changes(cursor, changes):
+    """Append (entity, entity_id) pairs to the change log under a new version.
+
+    Call as the last statement before commit: the version counter row stays
+    locked until commit, so versions become visible in order and clients
+    never skip one. Large batches are spread over consecutive versions of
+    at most 'page_entries' rows each, so /api/changes can page through
+    them. Returns the last version used.
+    """
+    changes = list(dict.fromkeys((entity, int(entity_id)) for entity, entity_id in changes))
+    if not changes:
+        return None
+    
+    chunk_size = CHANGE_FEED_CONFIG['page_entries']
+    chunks = [changes[start:start + chunk_size] for start in range(0, len(changes), chunk_size)]
+    cursor.execute("""
+        UPDATE change_log_version SET version = LAST_INSERT_ID(version + %s) WHERE id = 1
+    """, (len(chunks),))
+    version = cursor.lastrowid
+    first_version = version - len(chunks) + 1
+    cursor.executemany("""
+        INSERT INTO change_log (version, entity, entity_id) VALUES (%s, %s, %s)
+    """, [(first_version + index, entity, entity_id)
+          for index, chunk in enumerate(chunks)
+          for entity, entity_id in chunk])
+    return version
+
+def _fetch_by_ids(cursor, query, ids, chunk_size=1000):
+    """Run an `IN ({ids})` query over ids in chunks"""
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cursor.execute(query.format(ids=', '.join(['%s'] * len(chunk))), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def compact_change_log(conn, retention_days):
+    """Drop superseded change log entries and entries older than the retention window"""
+    cursor = conn.cursor()
+    try:
+        # A client behind a superseded entry also receives the newer one
+        cursor.execute("""
+            DELETE c FROM change_log c
+            JOIN (
+                SELECT entity, entity_id, MAX(version) as version
+                FROM change_log
+                GROUP BY entity, entity_id
+            ) latest ON c.entity = latest.entity AND c.entity_id = latest.entity_id
+            WHERE c.version < latest.version
+        """)
+        superseded = cursor.rowcount
+        
+        cursor.execute("""
+            SELECT MAX(version) FROM change_log
+            WHERE changed_at < NOW() - INTERVAL %s DAY
+        """, (retention_days,))
+        floor = cursor.fetchone()[0]
+        expired = 0
+        if floor:
+            cursor.execute("DELETE FROM change_log WHERE version <= %s", (floor,))
+            expired = cursor.rowcount
+            cursor.execute("""
+                UPDATE change_log_version
+                SET compacted_version = GREATEST(compacted_version, %s)
+                WHERE id = 1
+            """, (floor,))
+        
+        conn.commit()
+    finally:
+        cursor.close()
+    
+    return superseded, expired
+
+@app.cli.command('compact-changes')
+def compact_changes_command():
+    """Compact the change log (e.g. nightly)"""
+    conn = get_db_connection()
+    if not conn:
+        print("Error connecting to MySQL")
+        return
+    
+    try:
+        superseded, expired = compact_change_log(conn, CHANGE_FEED_CONFIG['retention_days'])
+    finally:
+        conn.close()
+    
+    print(f"Removed {superseded} superseded and {expired} expired change log entries")
+
+@app.route('/api/changes')
+def get_changes():
+    """Get products, categories, customers and stock changed since a version.
+
+    Returns current rows for everything changed after `since`, plus ids of
+    deleted rows. `reset` is set when the client has no usable version
+    (first sync or compacted away) and must reload the full lists.
+    """
+    since = request.args.get('since', 0, type=int)
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute("""
+            SELECT version, compacted_version FROM change_log_version WHERE id = 1
+        """)
+        state = cursor.fetchone()
+        
+        if since <= 0 or since < state['compacted_version'] or since > state['version']:
+            return jsonify({'version': state['version'], 'reset': True})
+        
+        # Page by versions and by changed rows, always taking at least one version
+        page_size = CHANGE_FEED_CONFIG['page_size']
+        page_entries = CHANGE_FEED_CONFIG['page_entries']
+        cursor.execute("""
+            SELECT version, COUNT(*) as entries FROM change_log
+            WHERE version > %s
+            GROUP BY version
+            ORDER BY version
+            LIMIT %s
+        """, (since, page_size + 1))
+        versions = cursor.fetchall()
+        upper, entries = since, 0
+        for index, row in enumerate(versions):
+            if index == page_size or (index and entries + row['entries'] > page_entries):
+                break
+            upper = row['version']
+            entries += row['entries']
+        has_more = bool(versions) and upper < versions[-1]['version']
+        if not has_more:
+            upper = state['version']
+        
+        cursor.execute("""
+            SELECT entity, entity_id FROM change_log
+            WHERE version > %s AND version <= %s
+            GROUP BY entity, entity_id
+        """, (since, upper))
+        changed = defaultdict(list)
+        for row in cursor.fetchall():
+            changed[row['entity']].append(row['entity_id'])
+        
+        # Full product rows already carry the stock level
+        products = set(changed['product'])
+        changed['stock'] = [pid for pid in changed['stock'] if pid not in products]
+        
+        result = {'version': upper, 'reset': False, 'has_more': has_more, 'deleted': {}}
+        for entity, (key, id_column, query) in CHANGE_ENTITIES.items():
+            ids = changed[entity]
+            rows = _fetch_by_ids(cursor, query, ids)
+            result[key] = rows
+            if entity != 'stock':
+                found = {row[id_column] for row in rows}
+                result['deleted'][key] = [i for i in ids if i not in found]
+        
+        return jsonify(result)
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+# ==================== STATIC ASSETS ====================
+
+ASSET_CONFIG = {
+    'max_age': 31536000,      # Fingerprinted URLs never change content, cache for a year
+    'min_compress_size': 512, # Smaller bodies are not worth the encoding overhead
+    'gzip_level': 9,
+    'brotli_quality': 11
+}
+
+ASSET_PATTERN = re.compile(r'^(.+)\.([0-9a-f]{12})(\.[A-Za-z0-9]+)$')
+
+_assets = {}
+_pages = {}
+_assets_lock = threading.Lock()
+
+def _compress_variants(data):
+    """Build identity, gzip and (if available) brotli encodings of a body"""
+    variants = {'identity': data}
+    if len(data) < ASSET_CONFIG['min_compress_size']:
+        return variants
+    
+    variants['gzip'] = gzip.compress(data, compresslevel=ASSET_CONFIG['gzip_level'], mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=ASSET_CONFIG['brotli_quality'])
+    return variants
+
+def load_asset(filename):
+    """Return the digest and encoded variants of a static file, or None if missing"""
+    asset = _assets.get(filename)
+    if asset is not None and not app.debug:
+        return asset
+    
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    if asset is not None and asset['digest'] == digest:
+        return asset
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    asset = {'digest': digest, 'mimetype': mimetype, 'variants': _compress_variants(data)}
+    with _assets_lock:
+        _assets[filename] = asset
+    return asset
+
+@app.template_global()
+def asset_url(filename):
+    """Fingerprinted URL for a static file, falls back to /static if it is missing"""
+    asset = load_asset(filename)
+    if asset is None:
+        return url_for('static', filename=filename)
+    
+    base, ext = os.path.splitext(filename)
+    return url_for('serve_asset', filename=f"{base}.{asset['digest']}{ext}")
+
+def _encoded_response(variants, mimetype):
+    """Pick the best encoding the client accepts and build the response"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    
+    response = Response(variants[encoding], mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    if len(variants) > 1:
+        response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted static file with immutable caching"""
+    match = ASSET_PATTERN.match(filename)
+    if not match:
+        abort(404)
+    
+    base, digest, ext = match.groups()
+    asset = load_asset(base + ext)
+    if asset is None or asset['digest'] != digest:
+        # Stale or unknown fingerprint - never cache old content under a new hash
+        abort(404)
+    
+    response = _encoded_response(asset['variants'], asset['mimetype'])
+    response.headers['Cache-Control'] = f"public, max-age={ASSET_CONFIG['max_age']}, immutable"
+    return response
+
+def render_page(template_name):
+    """Render a page template once and serve it compressed with ETag revalidation"""
+    page = None if app.debug else _pages.get(template_name)
+    if page is None:
+        body = render_template(template_name).encode('utf-8')
+        page = {'etag': hashlib.sha256(body).hexdigest()[:16], 'variants': _compress_variants(body)}
+        if not app.debug:
+            with _assets_lock:
+                _pages[template_name] = page
+    
+    response = _encoded_response(page['variants'], 'text/html')
+    response.set_etag(page['etag'], weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 # ==================== HOME DASHBOARD ====================
 
 @app.route('/')
 def index():
     """Main dashboard page"""
-    return render_template('index.html')
+    return render_page('index.html')
 
 @app.route('/dashboard')
 def dashboard():
     """Dashboard with summary widgets"""
-    return render_template('dashboard.html')
+    return render_page('dashboard.html')
 
 # ==================== API: DASHBOARD ====================
 
@@ -73,7 +908,7 @@ def get_dashboard_stats():
         cursor.execute("""
             SELECT COALESCE(SUM(total_amount), 0) as today_sales 
             FROM sales 
-            WHERE DATE(sale_date) = CURDATE()
+            WHERE sale_date >= CURDATE() AND sale_date < CURDATE() + INTERVAL 1 DAY
         """)
         stats['today_sales'] = cursor.fetchone()['today_sales']
         
@@ -81,7 +916,7 @@ def get_dashboard_stats():
         cursor.execute("""
             SELECT COUNT(*) as today_transactions 
             FROM sales 
-            WHERE DATE(sale_date) = CURDATE()
+            WHERE sale_date >= CURDATE() AND sale_date < CURDATE() + INTERVAL 1 DAY
         """)
         stats['today_transactions'] = cursor.fetchone()['today_transactions']
         
@@ -111,8 +946,7 @@ def get_dashboard_stats():
         cursor.execute("""
             SELECT COALESCE(SUM(total_amount), 0) as monthly_sales 
             FROM sales 
-            WHERE MONTH(sale_date) = MONTH(CURDATE()) 
-            AND YEAR(sale_date) = YEAR(CURDATE())
+            WHERE sale_date >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
         """)
         stats['monthly_sales'] = cursor.fetchone()['monthly_sales']
         
@@ -124,6 +958,7 @@ def get_dashboard_stats():
             JOIN products p ON si.product_id = p.product_id
             JOIN sales s ON si.sale_id = s.sale_id
             WHERE s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+            AND si.sale_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
             GROUP BY p.product_id
             ORDER BY total_sold DESC
             LIMIT 5
@@ -143,11 +978,36 @@ def get_dashboard_stats():
 @app.route('/inventory')
 def inventory():
     """Inventory management page"""
-    return render_template('inventory.html')
+    return render_page('inventory.html')
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
     """Get all products"""
+    search = request.args.get('search', '')
+    category_id = request.args.get('category_id', '')
+    
+    # Unfiltered and category-filtered listings are cached; free-text
+    # searches are too varied to be worth caching
+    if not search:
+        query = """
+            SELECT p.*, c.category_name 
+            FROM products p
+            LEFT JOIN categories c ON p.category_id = c.category_id
+        """
+        params = []
+        if category_id:
+            query += " WHERE p.category_id = %s"
+            params.append(int(category_id))
+        query += " ORDER BY p.product_name"
+        
+        try:
+            products = cached_fetchall(query, params, tags=('products', 'categories'))
+        except Error as e:
+            return jsonify({'error': str(e)}), 500
+        if products is None:
+            return jsonify({'error': 'Database connection failed'}), 500
+        return jsonify(products)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -155,9 +1015,6 @@ def get_products():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        search = request.args.get('search', '')
-        category_id = request.args.get('category_id', '')
-        
         query = """
             SELECT p.*, c.category_name 
             FROM products p
@@ -166,10 +1023,9 @@ def get_products():
         """
         params = []
         
-        if search:
-            query += " AND (p.product_name LIKE %s OR p.barcode LIKE %s)"
-            search_param = f"%{search}%"
-            params.extend([search_param, search_param])
+        query += " AND (p.product_name LIKE %s OR p.barcode LIKE %s)"
+        search_param = f"%{search}%"
+        params.extend([search_param, search_param])
         
         if category_id:
             query += " AND p.category_id = %s"
@@ -216,9 +1072,16 @@ def add_product():
             data.get('expiry_date') or None,
             data.get('description')
         ))
+        product_id = cursor.lastrowid
+        
+        # Opening stock becomes the product's first lot
+        if int(data.get('quantity') or 0) > 0:
+            insert_lot(cursor, product_id, data.get('quantity'), data.get('expiry_date') or None)
+        
+        record_changes(cursor, [('product', product_id)])
         
         conn.commit()
-        product_id = cursor.lastrowid
+        query_cache.invalidate('products')
         
         return jsonify({'message': 'Product added successfully', 'product_id': product_id})
     
@@ -231,7 +1094,16 @@ def add_product():
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
-    """Update product"""
+    """Update product.
+
+    expiry_date is derived from the product's lots and is not written
+    directly. A quantity change is recorded against the lots: added stock
+    becomes an adjustment lot (expiring on the submitted expiry_date) and
+    removed stock is taken first expiry first out. Clients send the
+    quantity their form started from as original_quantity; an unchanged
+    quantity leaves stock alone, and a change made against stock that has
+    moved since (e.g. sales) is refused with 409.
+    """
     data = request.get_json()
     
     conn = get_db_connection()
@@ -241,11 +1113,29 @@ def update_product(product_id):
     cursor = conn.cursor()
     
     try:
+        # Lock the product row before its lots, in the same order as checkout
+        cursor.execute("SELECT quantity FROM products WHERE product_id = %s FOR UPDATE", (product_id,))
+        row = cursor.fetchone()
+        if not row:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        current = row[0]
+        quantity = data.get('quantity')
+        original = data.get('original_quantity')
+        if quantity is None or (original is not None and int(quantity) == int(original)):
+            adjustment = 0
+        elif original is not None and int(original) != current:
+            conn.rollback()
+            return jsonify({'error': 'Stock has changed since this product was loaded; '
+                                     'reload and enter the quantity again'}), 409
+        else:
+            adjustment = int(quantity) - current
+        
         cursor.execute("""
             UPDATE products 
             SET product_name = %s, category_id = %s, barcode = %s, 
-                price = %s, cost_price = %s, quantity = %s, 
-                low_stock_threshold = %s, expiry_date = %s, description = %s
+                price = %s, cost_price = %s, quantity = quantity + %s, 
+                low_stock_threshold = %s, description = %s
             WHERE product_id = %s
         """, (
             data.get('product_name'),
@@ -253,14 +1143,21 @@ def update_product(product_id):
             data.get('barcode'),
             data.get('price'),
             data.get('cost_price'),
-            data.get('quantity'),
+            adjustment,
             data.get('low_stock_threshold'),
-            data.get('expiry_date') or None,
             data.get('description'),
             product_id
         ))
         
+        if adjustment > 0:
+            insert_lot(cursor, product_id, adjustment, data.get('expiry_date') or None, 'ADJUSTMENT')
+        elif adjustment < 0:
+            take_from_lots(cursor, product_id, -adjustment)
+        refresh_next_expiry(cursor, [product_id])
+        record_changes(cursor, [('product', product_id)])
+        
         conn.commit()
+        query_cache.invalidate(f'products:{product_id}')
         
         return jsonify({'message': 'Product updated successfully'})
     
@@ -281,8 +1178,16 @@ def delete_product(product_id):
     cursor = conn.cursor()
     
     try:
+        # sale_items is partitioned and has no foreign key, so keep
+        # products that appear on invoices
+        cursor.execute("SELECT 1 FROM sale_items WHERE product_id = %s LIMIT 1", (product_id,))
+        if cursor.fetchone():
+            return jsonify({'error': 'Product has sales history and cannot be deleted'}), 400
+        
         cursor.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
+        record_changes(cursor, [('product', product_id)])
         conn.commit()
+        query_cache.invalidate(f'products:{product_id}')
         
         return jsonify({'message': 'Product deleted successfully'})
     
@@ -296,6 +1201,251 @@ def delete_product(product_id):
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     """Get all categories"""
+    try:
+        categories = cached_fetchall("SELECT * FROM categories ORDER BY category_name",
+                                     tags=('categories',))
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if categories is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return jsonify(categories)
+
+# ==================== LOT INVENTORY ====================
+
+def insert_lot(cursor, product_id, quantity, expiry_date, lot_number=None):
+    """Record a received stock lot; the caller adjusts products.quantity"""
+    cursor.execute("""
+        INSERT INTO product_lots (product_id, lot_number, quantity_received, 
+                                  quantity_remaining, expiry_date)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (product_id, lot_number, quantity, quantity, expiry_date))
+    return cursor.lastrowid
+
+def refresh_next_expiry(cursor, product_ids):
+    """Set products.expiry_date to the earliest expiry among their active lots"""
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return
+    cursor.execute(f"""
+        UPDATE products p
+        SET p.expiry_date = (
+            SELECT MIN(l.expiry_date) FROM product_lots l
+            WHERE l.product_id = p.product_id AND l.status = 'Active'
+        )
+        WHERE p.product_id IN ({', '.join(['%s'] * len(product_ids))})
+    """, product_ids)
+
+def take_from_lots(cursor, product_id, quantity):
+    """Take stock from a product's lots, first expiry first out.
+
+    Lots without an expiry date go last. Stock not held in any lot (e.g.
+    opening stock from before lots were tracked) covers whatever the lots
+    cannot. Returns ([(quantity, lot_id)], depleted) where depleted is True
+    if a lot ran out and the product's next expiry date may have changed.
+    """
+    cursor.execute("""
+        SELECT lot_id, quantity_remaining
+        FROM product_lots
+        WHERE product_id = %s AND status = 'Active'
+        AND (expiry_date IS NULL OR expiry_date >= CURDATE())
+        ORDER BY expiry_date IS NULL, expiry_date, lot_id
+        FOR UPDATE
+    """, (product_id,))
+    
+    allocations = []
+    depleted = False
+    remaining = int(quantity)
+    for lot_id, available in cursor.fetchall():
+        if remaining <= 0:
+            break
+        take = min(available, remaining)
+        allocations.append((take, lot_id))
+        remaining -= take
+        depleted = depleted or take == available
+    
+    if allocations:
+        # MySQL applies SET assignments left to right, so status sees the new quantity
+        cursor.executemany("""
+            UPDATE product_lots
+            SET quantity_remaining = quantity_remaining - %s,
+                status = IF(quantity_remaining = 0, 'Depleted', status)
+            WHERE lot_id = %s
+        """, allocations)
+    return allocations, depleted
+
+def allocate_lots_fefo(cursor, sale_id, product_id, quantity):
+    """Take sold stock from a product's lots and record which lots it came from.
+
+    Returns True if a lot ran out and the product's next expiry date changed.
+    """
+    allocations, depleted = take_from_lots(cursor, product_id, quantity)
+    if not allocations:
+        return False
+    
+    cursor.executemany("""
+        INSERT INTO sale_lot_allocations (sale_id, product_id, lot_id, quantity)
+        VALUES (%s, %s, %s, %s)
+    """, [(sale_id, product_id, lot_id, take) for take, lot_id in allocations])
+    
+    if depleted:
+        refresh_next_expiry(cursor, [product_id])
+    return depleted
+
+def sweep_expired_lots(conn, chunk_size=500):
+    """Expire active lots past their expiry date and write their stock off.
+
+    Only lots that expired since the last sweep are still 'Active', so each
+    run reads just those through the (status, expiry_date) index. Product
+    rows are locked before their lots, in product_id order, as checkout
+    does, so a sweep during trading hours cannot deadlock with a sale; each
+    chunk of products is its own transaction. Returns the number of lots
+    expired.
+    """
+    cursor = conn.cursor()
+    expired = 0
+    try:
+        cursor.execute("""
+            SELECT DISTINCT product_id FROM product_lots
+            WHERE status = 'Active' AND expiry_date < CURDATE()
+            ORDER BY product_id
+        """)
+        product_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"""
+                SELECT product_id FROM products
+                WHERE product_id IN ({placeholders})
+                ORDER BY product_id
+                FOR UPDATE
+            """, chunk)
+            cursor.fetchall()
+            
+            cursor.execute(f"""
+                SELECT lot_id, product_id, quantity_remaining
+                FROM product_lots
+                WHERE status = 'Active' AND expiry_date < CURDATE()
+                AND product_id IN ({placeholders})
+                FOR UPDATE
+            """, chunk)
+            lots = cursor.fetchall()
+            if not lots:
+                conn.commit()
+                continue
+            
+            write_offs = defaultdict(int)
+            for _, product_id, quantity_remaining in lots:
+                write_offs[product_id] += quantity_remaining
+            
+            cursor.executemany("UPDATE product_lots SET status = 'Expired' WHERE lot_id = %s",
+                               [(lot_id,) for lot_id, _, _ in lots])
+            cursor.executemany("""
+                UPDATE products SET quantity = GREATEST(quantity - %s, 0) WHERE product_id = %s
+            """, [(quantity, product_id) for product_id, quantity in sorted(write_offs.items())])
+            refresh_next_expiry(cursor, sorted(write_offs))
+            record_changes(cursor, [('product', product_id) for product_id in write_offs])
+            
+            conn.commit()
+            query_cache.invalidate(*[f'products:{product_id}' for product_id in write_offs])
+            expired += len(lots)
+    finally:
+        cursor.close()
+    
+    return expired
+
+@app.cli.command('expire-lots')
+def expire_lots_command():
+    """Expire lots past their expiry date and write off their stock (e.g. nightly)"""
+    conn = get_db_connection()
+    if not conn:
+        print("Error connecting to MySQL")
+        return
+    
+    try:
+        expired = sweep_expired_lots(conn)
+    finally:
+        conn.close()
+    
+    print(f"Expired {expired} lots")
+
+@app.route('/api/products/<int:product_id>/lots', methods=['GET'])
+def get_product_lots(product_id):
+    """Get a product's lots in allocation order"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute("""
+            SELECT * FROM product_lots
+            WHERE product_id = %s
+            ORDER BY status, expiry_date IS NULL, expiry_date, lot_id
+        """, (product_id,))
+        lots = cursor.fetchall()
+        return jsonify(lots)
+    
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/api/products/<int:product_id>/lots', methods=['POST'])
+def receive_lot(product_id):
+    """Receive a new stock lot for a product"""
+    data = request.get_json(silent=True) or {}
+    
+    quantity = data.get('quantity')
+    if isinstance(quantity, str) and quantity.strip().isdigit():
+        quantity = int(quantity)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+        return jsonify({'error': 'quantity must be a positive whole number'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    cursor = conn.cursor()
+    
+    try:
+        # Update the product row before inserting the lot: the lot's foreign
+        # key check would otherwise take a shared lock first, and two receipts
+        # of the same product would deadlock upgrading it
+        cursor.execute("""
+            UPDATE products SET quantity = quantity + %s WHERE product_id = %s
+        """, (quantity, product_id))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return jsonify({'error': 'Product not found'}), 404
+        
+        lot_id = insert_lot(cursor, product_id, quantity,
+                            data.get('expiry_date') or None, data.get('lot_number'))
+        refresh_next_expiry(cursor, [product_id])
+        record_changes(cursor, [('product', product_id)])
+        
+        conn.commit()
+        query_cache.invalidate(f'products:{product_id}')
+        
+        return jsonify({'message': 'Lot received successfully', 'lot_id': lot_id})
+    
+    except Error as e:
+        conn.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.route('/api/lots/expiring')
+def get_expiring_lots():
+    """Get active lots expiring within the next N days, soonest first"""
+    days = request.args.get('days', 7, type=int)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -303,9 +1453,21 @@ def get_categories():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("SELECT * FROM categories ORDER BY category_name")
-        categories = cursor.fetchall()
-        return jsonify(categories)
+        # Range scan on idx_lots_status_expiry: cost grows with the number
+        # of matching lots, not the size of the catalog
+        cursor.execute("""
+            SELECT l.lot_id, l.product_id, p.product_name, l.lot_number,
+                   l.quantity_remaining, l.expiry_date,
+                   DATEDIFF(l.expiry_date, CURDATE()) as days_left
+            FROM product_lots l
+            JOIN products p ON l.product_id = p.product_id
+            WHERE l.status = 'Active'
+            AND l.expiry_date >= CURDATE()
+            AND l.expiry_date < CURDATE() + INTERVAL %s DAY
+            ORDER BY l.expiry_date, l.lot_id
+        """, (days,))
+        lots = cursor.fetchall()
+        return jsonify(lots)
     
     except Error as e:
         return jsonify({'error': str(e)}), 500
@@ -318,7 +1480,7 @@ def get_categories():
 @app.route('/billing')
 def billing():
     """Billing/POS page"""
-    return render_template('billing.html')
+    return render_page('billing.html')
 
 @app.route('/api/products/search')
 def search_products():
@@ -362,17 +1524,22 @@ def create_sale():
     cursor = conn.cursor()
     
     try:
+        # Sale, items and transaction share one timestamp so they land in
+        # the same monthly partition
+        sale_date = datetime.now().replace(microsecond=0)
+        
         # Generate invoice number
-        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        invoice_number = f"INV-{sale_date.strftime('%Y%m%d%H%M%S')}"
         
         # Insert sale record
         cursor.execute("""
-            INSERT INTO sales (customer_id, subtotal, discount_amount, 
+            INSERT INTO sales (customer_id, sale_date, subtotal, discount_amount, 
                              tax_amount, total_amount, payment_method, 
                              invoice_number, notes)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (
             data.get('customer_id') or None,
+            sale_date,
             data.get('subtotal'),
             data.get('discount_amount', 0),
             data.get('tax_amount', 0),
@@ -384,33 +1551,42 @@ def create_sale():
         
         sale_id = cursor.lastrowid
         
-        # Insert sale items and update stock
+        # Insert sale items
+        sold = defaultdict(int)
         for item in data.get('items', []):
-            # Insert sale item
             cursor.execute("""
-                INSERT INTO sale_items (sale_id, product_id, quantity, 
+                INSERT INTO sale_items (sale_id, sale_date, product_id, quantity, 
                                        unit_price, total_price)
-                VALUES (%s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s)
             """, (
                 sale_id,
+                sale_date,
                 item['product_id'],
                 item['quantity'],
                 item['price'],
                 item['total_price']
             ))
-            
-            # Update product quantity
+            sold[int(item['product_id'])] += int(item['quantity'])
+        
+        # Update stock once per product, even if it is on several lines, in
+        # product_id order so concurrent writers lock rows in the same order
+        refreshed_products = []
+        for product_id in sorted(sold):
             cursor.execute("""
                 UPDATE products 
                 SET quantity = quantity - %s 
                 WHERE product_id = %s
-            """, (item['quantity'], item['product_id']))
+            """, (sold[product_id], product_id))
+            
+            if allocate_lots_fefo(cursor, sale_id, product_id, sold[product_id]):
+                refreshed_products.append(product_id)
         
         # Insert transaction record
         cursor.execute("""
-            INSERT INTO transactions (sale_id, amount, payment_method, status)
-            VALUES (%s, %s, %s, 'Completed')
-        """, (sale_id, data.get('total_amount'), data.get('payment_method')))
+            INSERT INTO transactions (sale_id, transaction_date, amount, 
+                                    payment_method, status)
+            VALUES (%s, %s, %s, %s, 'Completed')
+        """, (sale_id, sale_date, data.get('total_amount'), data.get('payment_method')))
         
         # Update customer total purchases if customer is selected
         if data.get('customer_id'):
@@ -420,8 +1596,21 @@ def create_sale():
                 WHERE customer_id = %s
             """, (data.get('total_amount'), data.get('customer_id')))
         
+        # Products whose next expiry moved need the full row, not just stock
+        changes = [('stock', product_id) for product_id in sold
+                   if product_id not in refreshed_products]
+        changes += [('product', product_id) for product_id in refreshed_products]
+        if data.get('customer_id'):
+            changes.append(('customer', data.get('customer_id')))
+        record_changes(cursor, changes)
+        
         conn.commit()
         
+        stale_tags = ['sales'] + [f'products:{product_id}' for product_id in sold]
+        if data.get('customer_id'):
+            stale_tags.append(f"customers:{data.get('customer_id')}")
+        query_cache.invalidate(*stale_tags)
+        
         return jsonify({
             'message': 'Sale completed successfully',
             'sale_id': sale_id,
@@ -440,7 +1629,7 @@ def create_sale():
 @app.route('/customers')
 def customers():
     """Customer management page"""
-    return render_template('customers.html')
+    return render_page('customers.html')
 
 @app.route('/api/customers', methods=['GET'])
 def get_customers():
@@ -453,6 +1642,7 @@ def get_customers():
     
     try:
         search = request.args.get('search', '')
+        segment = request.args.get('segment', '')
         
         query = "SELECT * FROM customers WHERE 1=1"
         params = []
@@ -461,6 +1651,10 @@ def get_customers():
             query += " AND (customer_name LIKE %s OR phone LIKE %s)"
             params.extend([f'%{search}%', f'%{search}%'])
         
+        if segment:
+            query += " AND rfm_segment = %s"
+            params.append(segment)
+        
         query += " ORDER BY customer_name"
         
         cursor.execute(query, params)
@@ -495,9 +1689,11 @@ def add_customer():
             data.get('email'),
             data.get('address')
         ))
+        customer_id = cursor.lastrowid
+        record_changes(cursor, [('customer', customer_id)])
         
         conn.commit()
-        customer_id = cursor.lastrowid
+        query_cache.invalidate('customers')
         
         return jsonify({'message': 'Customer added successfully', 'customer_id': customer_id})
     
@@ -531,8 +1727,10 @@ def update_customer(customer_id):
             data.get('address'),
             customer_id
         ))
+        record_changes(cursor, [('customer', customer_id)])
         
         conn.commit()
+        query_cache.invalidate(f'customers:{customer_id}')
         
         return jsonify({'message': 'Customer updated successfully'})
     
@@ -553,8 +1751,12 @@ def delete_customer(customer_id):
     cursor = conn.cursor()
     
     try:
+        # sales is partitioned and has no foreign key to customers
+        cursor.execute("UPDATE sales SET customer_id = NULL WHERE customer_id = %s", (customer_id,))
         cursor.execute("DELETE FROM customers WHERE customer_id = %s", (customer_id,))
+        record_changes(cursor, [('customer', customer_id)])
         conn.commit()
+        query_cache.invalidate(f'customers:{customer_id}')
         
         return jsonify({'message': 'Customer deleted successfully'})
     
@@ -568,38 +1770,290 @@ def delete_customer(customer_id):
 @app.route('/api/customers/<int:customer_id>/history')
 def get_customer_history(customer_id):
     """Get customer purchase history"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute("""
+        # Tagged with the customer row: create_sale invalidates it for
+        # the buying customer only
+        history = cached_fetchall("""
             SELECT s.sale_id, s.invoice_number, s.sale_date, s.total_amount, 
                    s.payment_method, s.status
             FROM sales s
             WHERE s.customer_id = %s
             ORDER BY s.sale_date DESC
             LIMIT 20
-        """, (customer_id,))
+        """, (customer_id,), tags=(f'customers:{customer_id}',))
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if history is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return jsonify(history)
+
+# ==================== CUSTOMER LOYALTY & RFM ====================
+
+# Loyalty/RFM batch configuration
+LOYALTY_CONFIG = {
+    'amount_per_point': 100,   # One loyalty point per this much spent on a sale
+    'chunk_size': 50000,       # Sales rows fetched per batch chunk
+    'settle_seconds': 300      # Only read sales older than this, so in-flight checkouts commit first
+}
+
+RFM_JOB_NAME = 'customer_rfm'
+
+class BatchAlreadyRunning(Exception):
+    """Another process holds the batch job's database lock"""
+
+def _quintile_scores(values):
+    """Score a Series 1-5 by percentile rank (5 = highest value).
+
+    Tied values share their average rank, so equal inputs get equal scores.
+    """
+    ranks = values.rank(method='average', pct=True)
+    return np.ceil(ranks * 5).clip(1, 5).astype(int)
+
+def _rfm_segments(r, f, m):
+    """Map recency/frequency/monetary score arrays to segment names"""
+    fm = (f + m) / 2
+    conditions = [
+        (r >= 4) & (fm >= 4),
+        (r >= 3) & (fm >= 3),
+        (r >= 4) & (f <= 2),
+        (r <= 2) & (fm >= 3),
+        (r <= 2) & (fm < 3)
+    ]
+    choices = ['Champions', 'Loyal', 'New', 'At Risk', 'Lost']
+    return np.select(conditions, choices, default='Needs Attention')
+
+def _bulk_update_customers(cursor, columns, rows, assignments):
+    """Apply per-customer values with one multi-row insert and one joined UPDATE"""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS customer_batch_delta")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE customer_batch_delta (
+            customer_id INT PRIMARY KEY, {', '.join(columns)}
+        ) ENGINE=MEMORY
+    """)
+    names = [col.split()[0] for col in columns]
+    cursor.executemany(f"""
+        INSERT INTO customer_batch_delta (customer_id, {', '.join(names)})
+        VALUES ({', '.join(['%s'] * (len(names) + 1))})
+    """, rows)
+    cursor.execute(f"""
+        UPDATE customers c
+        JOIN customer_batch_delta d ON c.customer_id = d.customer_id
+        SET {assignments}
+    """)
+    cursor.execute("DROP TEMPORARY TABLE customer_batch_delta")
+
+def accumulate_customer_purchases(conn, chunk_size):
+    """Fold completed sales newer than the high-water mark into customer totals.
+
+    Streams sales in sale_id order, one chunk per transaction, so an
+    interrupted run resumes where it stopped. Sale ids are assigned at
+    insert time, not commit time, so only sales older than the settle
+    window are read; a checkout still open when the mark moves past its id
+    would otherwise be skipped for good. Returns the number of sales
+    processed. Later status changes of already processed sales are not
+    re-applied.
+    """
+    cursor = conn.cursor(dictionary=True)
+    processed = 0
+    try:
+        cursor.execute("""
+            SELECT high_water_mark FROM batch_job_state WHERE job_name = %s
+        """, (RFM_JOB_NAME,))
+        row = cursor.fetchone()
+        high_water_mark = row['high_water_mark'] if row else 0
+        
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND as cutoff",
+                       (LOYALTY_CONFIG['settle_seconds'],))
+        cutoff = cursor.fetchone()['cutoff']
+        
+        while True:
+            cursor.execute("""
+                SELECT sale_id, customer_id, sale_date, total_amount
+                FROM sales
+                WHERE sale_id > %s AND sale_date < %s
+                AND customer_id IS NOT NULL AND status = 'Completed'
+                ORDER BY sale_id
+                LIMIT %s
+            """, (high_water_mark, cutoff, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            chunk = pd.DataFrame(rows)
+            chunk['total_amount'] = chunk['total_amount'].astype(float)
+            chunk['points'] = np.floor(chunk['total_amount'] / LOYALTY_CONFIG['amount_per_point'])
+            totals = chunk.groupby('customer_id').agg(
+                purchases=('sale_id', 'count'),
+                amount=('total_amount', 'sum'),
+                points=('points', 'sum'),
+                last_purchase=('sale_date', 'max')
+            )
+            
+            _bulk_update_customers(
+                cursor,
+                ['purchases INT', 'amount DECIMAL(12, 2)', 'points INT', 'last_purchase DATETIME'],
+                [(int(cid), int(t.purchases), round(float(t.amount), 2), int(t.points),
+                  t.last_purchase.to_pydatetime())
+                 for cid, t in totals.iterrows()],
+                """c.purchase_count = c.purchase_count + d.purchases,
+                   c.rfm_monetary = c.rfm_monetary + d.amount,
+                   c.loyalty_points = c.loyalty_points + d.points,
+                   c.last_purchase_date = GREATEST(COALESCE(c.last_purchase_date, d.last_purchase),
+                                                   d.last_purchase)"""
+            )
+            
+            high_water_mark = int(chunk['sale_id'].iloc[-1])
+            cursor.execute("""
+                INSERT INTO batch_job_state (job_name, high_water_mark, last_run_at)
+                VALUES (%s, %s, NOW())
+                ON DUPLICATE KEY UPDATE high_water_mark = VALUES(high_water_mark),
+                                        last_run_at = VALUES(last_run_at)
+            """, (RFM_JOB_NAME, high_water_mark))
+            record_changes(cursor, [('customer', cid) for cid in totals.index])
+            conn.commit()
+            processed += len(rows)
+            
+            if len(rows) < chunk_size:
+                break
+    finally:
+        cursor.close()
+    
+    return processed
+
+def score_customers(conn):
+    """Recompute RFM scores and segments for every customer with purchases.
+
+    Scores are quintiles over the customer base, so they are recomputed in
+    full; this reads one row per customer, not per sale.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT customer_id, purchase_count, rfm_monetary, rfm_score, rfm_segment,
+                   DATEDIFF(CURDATE(), last_purchase_date) as recency_days
+            FROM customers
+            WHERE purchase_count > 0
+        """)
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
         
-        history = cursor.fetchall()
+        frame = pd.DataFrame(rows)
+        r = 6 - _quintile_scores(frame['recency_days'].astype(float))
+        f = _quintile_scores(frame['purchase_count'].astype(float))
+        m = _quintile_scores(frame['rfm_monetary'].astype(float))
+        frame['score'] = r.astype(str) + f.astype(str) + m.astype(str)
+        frame['segment'] = _rfm_segments(r.to_numpy(), f.to_numpy(), m.to_numpy())
         
-        return jsonify(history)
+        # Only write (and publish to the change feed) customers whose score moved
+        changed = frame[(frame['score'] != frame['rfm_score']) |
+                        (frame['segment'] != frame['rfm_segment'])]
+        if not changed.empty:
+            _bulk_update_customers(
+                cursor,
+                ['score CHAR(3)', 'segment VARCHAR(30)'],
+                list(zip(changed['customer_id'].astype(int).tolist(),
+                         changed['score'].tolist(), changed['segment'].tolist())),
+                "c.rfm_score = d.score, c.rfm_segment = d.segment"
+            )
+            record_changes(cursor, [('customer', cid) for cid in changed['customer_id']])
+        conn.commit()
+        return len(rows)
+    finally:
+        cursor.close()
+
+def run_customer_rfm_batch(chunk_size=None):
+    """Run the incremental loyalty/RFM batch. Returns a summary dict.
+
+    The run holds a MySQL named lock, so overlapping runs from the CLI or
+    any worker cannot fold the same sales in twice; raises
+    BatchAlreadyRunning if another run holds it.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
     
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
+    lock_name = f"{DB_CONFIG['database']}.{RFM_JOB_NAME}"
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (lock_name,))
+        if cursor.fetchone()[0] != 1:
+            raise BatchAlreadyRunning(RFM_JOB_NAME)
+        try:
+            processed = accumulate_customer_purchases(conn, chunk_size or LOYALTY_CONFIG['chunk_size'])
+            scored = score_customers(conn)
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+            cursor.fetchone()
     finally:
         cursor.close()
         conn.close()
+    
+    query_cache.invalidate('customers:*')
+    return {'sales_processed': processed, 'customers_scored': scored}
+
+@app.cli.command('rfm')
+def rfm_command():
+    """Run the loyalty points / RFM segmentation batch (e.g. nightly)"""
+    try:
+        result = run_customer_rfm_batch()
+    except BatchAlreadyRunning:
+        print("RFM batch is already running")
+        return
+    
+    if result is None:
+        print("Error connecting to MySQL")
+    else:
+        print(f"Processed {result['sales_processed']} sales, "
+              f"scored {result['customers_scored']} customers")
+
+@app.route('/api/customers/rfm/run', methods=['POST'])
+def run_customer_rfm():
+    """Run the loyalty points / RFM segmentation batch"""
+    try:
+        result = run_customer_rfm_batch()
+    except BatchAlreadyRunning:
+        return jsonify({'error': 'RFM batch is already running'}), 409
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if result is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return jsonify(result)
+
+@app.route('/api/customers/segments')
+def get_customer_segments():
+    """Get customer counts, value and loyalty points per RFM segment"""
+    try:
+        segments = cached_fetchall("""
+            SELECT COALESCE(rfm_segment, 'Unscored') as segment,
+                   COUNT(*) as customers,
+                   SUM(rfm_monetary) as total_value,
+                   SUM(loyalty_points) as loyalty_points
+            FROM customers
+            GROUP BY rfm_segment
+            ORDER BY total_value DESC
+        """, tags=('customers',))
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if segments is None:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return jsonify(segments)
 
 # ==================== TRANSACTION MANAGEMENT ====================
 
 @app.route('/transactions')
 def transactions():
     """Transaction management page"""
-    return render_template('transactions.html')
+    return render_page('transactions.html')
 
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
@@ -624,11 +2078,11 @@ def get_transactions():
         params = []
         
         if start_date:
-            query += " AND DATE(t.transaction_date) >= %s"
+            query += " AND t.transaction_date >= %s"
             params.append(start_date)
         
         if end_date:
-            query += " AND DATE(t.transaction_date) <= %s"
+            query += " AND t.transaction_date < DATE_ADD(%s, INTERVAL 1 DAY)"
             params.append(end_date)
         
         query += " ORDER BY t.transaction_date DESC"
@@ -666,11 +2120,11 @@ def get_sales():
         params = []
         
         if start_date:
-            query += " AND DATE(s.sale_date) >= %s"
+            query += " AND s.sale_date >= %s"
             params.append(start_date)
         
         if end_date:
-            query += " AND DATE(s.sale_date) <= %s"
+            query += " AND s.sale_date < DATE_ADD(%s, INTERVAL 1 DAY)"
             params.append(end_date)
         
         query += " ORDER BY s.sale_date DESC"
@@ -689,6 +2143,10 @@ def get_sales():
 @app.route('/api/sales/<int:sale_id>')
 def get_sale_details(sale_id):
     """Get sale details with items"""
+    sale = query_cache.get(query_cache.make_key('sale_details', (sale_id,)))
+    if sale is not None:
+        return jsonify(sale)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -696,29 +2154,11 @@ def get_sale_details(sale_id):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Get sale info
-        cursor.execute("""
-            SELECT s.*, c.customer_name, c.phone, c.address
-            FROM sales s
-            LEFT JOIN customers c ON s.customer_id = c.customer_id
-            WHERE s.sale_id = %s
-        """, (sale_id,))
-        sale = cursor.fetchone()
+        sale = fetch_sale_details(cursor, sale_id)
         
         if not sale:
             return jsonify({'error': 'Sale not found'}), 404
         
-        # Get sale items
-        cursor.execute("""
-            SELECT si.*, p.product_name
-            FROM sale_items si
-            JOIN products p ON si.product_id = p.product_id
-            WHERE si.sale_id = %s
-        """, (sale_id,))
-        items = cursor.fetchall()
-        
-        sale['items'] = items
-        
         return jsonify(sale)
     
     except Error as e:
@@ -727,12 +2167,351 @@ def get_sale_details(sale_id):
         cursor.close()
         conn.close()
 
+def fetch_sale_details(cursor, sale_id):
+    """Load a sale with its items from the hot tables or the archive and cache it.
+
+    Returns None if the sale doesn't exist.
+    """
+    cache_key = query_cache.make_key('sale_details', (sale_id,))
+    generation = query_cache.generation()
+    
+    # Get sale info
+    cursor.execute("""
+        SELECT s.*, c.customer_name, c.phone, c.address
+        FROM sales s
+        LEFT JOIN customers c ON s.customer_id = c.customer_id
+        WHERE s.sale_id = %s
+    """, (sale_id,))
+    sale = cursor.fetchone()
+    
+    if not sale:
+        # Fall back to the archive for sales from archived months
+        sale = load_archived_sale(cursor, sale_id)
+        if sale:
+            query_cache.set(cache_key, sale, [f'sales:{sale_id}'], since=generation)
+        return sale
+    
+    # Get sale items
+    cursor.execute("""
+        SELECT si.*, p.product_name
+        FROM sale_items si
+        JOIN products p ON si.product_id = p.product_id
+        WHERE si.sale_id = %s
+    """, (sale_id,))
+    items = cursor.fetchall()
+    
+    sale['items'] = items
+    
+    # Finished sales don't change, so only joined product/customer
+    # rows can make the cached copy stale
+    if sale['status'] in FINISHED_SALE_STATUSES:
+        tags = [f'sales:{sale_id}'] + [f"products:{item['product_id']}" for item in items]
+        if sale['customer_id']:
+            tags.append(f"customers:{sale['customer_id']}")
+        query_cache.set(cache_key, sale, tags, since=generation)
+    
+    return sale
+
+# ==================== RECEIPTS ====================
+
+# Receipt rendering configuration
+RECEIPT_CONFIG = {
+    'store_name': 'Grocery Store',
+    'cache_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'receipts'),
+    'workers': os.cpu_count() or 2,
+    'width': 576          # Image width in pixels (80mm thermal paper at 180 dpi)
+}
+
+RECEIPT_FORMATS = {
+    'html': 'text/html',
+    'pdf': 'application/pdf',
+    'png': 'image/png'
+}
+
+def _money(amount):
+    return f"{decimal.Decimal(amount or 0):.2f}"
+
+def _receipt_lines(sale):
+    """Lay a receipt out as (left, right) text pairs; None is a separator rule"""
+    sale_date = sale['sale_date']
+    lines = [
+        (RECEIPT_CONFIG['store_name'], ''),
+        None,
+        ('Invoice', sale['invoice_number']),
+        ('Date', sale_date.strftime('%d %b %Y %H:%M') if sale_date else '-'),
+        ('Customer', sale.get('customer_name') or 'Walk-in Customer'),
+        None
+    ]
+    for item in sale['items']:
+        lines.append((item.get('product_name') or f"Product #{item['product_id']}", ''))
+        lines.append((f"  {item['quantity']} x {_money(item['unit_price'])}", _money(item['total_price'])))
+    lines += [
+        None,
+        ('Subtotal', _money(sale['subtotal'])),
+        ('Discount', '-' + _money(sale['discount_amount'])),
+        ('Tax', _money(sale['tax_amount'])),
+        ('Total', 'Rs. ' + _money(sale['total_amount'])),
+        None,
+        ('Payment', sale['payment_method']),
+        ('Status', sale['status'])
+    ]
+    return lines
+
+def _draw_receipt(sale):
+    """Draw a receipt as a narrow greyscale image"""
+    font = ImageFont.load_default(size=22)
+    width, margin, line_height = RECEIPT_CONFIG['width'], 24, 32
+    lines = _receipt_lines(sale)
+    
+    image = Image.new('L', (width, margin * 2 + line_height * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    y = margin
+    for line in lines:
+        if line is None:
+            draw.line((margin, y + line_height // 2, width - margin, y + line_height // 2), fill=0)
+        else:
+            left, right = line
+            draw.text((margin, y), left, font=font, fill=0)
+            if right:
+                draw.text((width - margin, y), str(right), font=font, fill=0, anchor='ra')
+        y += line_height
+    return image
+
+def render_receipt(sale, fmt):
+    """Render one receipt as HTML, PDF or PNG bytes"""
+    if fmt == 'html':
+        template = app.jinja_env.get_template('receipt.html')
+        return template.render(sale=sale, store_name=RECEIPT_CONFIG['store_name']).encode('utf-8')
+    
+    output = io.BytesIO()
+    if fmt == 'pdf':
+        _draw_receipt(sale).save(output, format='PDF', resolution=180)
+    else:
+        _draw_receipt(sale).save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+def _render_receipt_job(job):
+    """Process pool entry point"""
+    sale, fmt = job
+    return render_receipt(sale, fmt)
+
+def _receipt_cache_path(sale, fmt):
+    # Status is part of the name so a refund never serves the old receipt
+    name = re.sub(r'[^A-Za-z0-9_-]', '_', sale['invoice_number'])
+    return os.path.join(RECEIPT_CONFIG['cache_path'], f"{name}-{sale['status']}.{fmt}")
+
+def _read_cached_receipt(sale, fmt):
+    try:
+        with open(_receipt_cache_path(sale, fmt), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write_cached_receipt(sale, fmt, data):
+    """Store a rendered receipt; failures are logged, the receipt is already rendered"""
+    path = _receipt_cache_path(sale, fmt)
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temp file per write, so concurrent threads never share one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        app.logger.warning("Could not cache receipt %s: %s", path, e)
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def get_receipt(sale, fmt):
+    """Return rendered receipt bytes, from the disk cache for finished sales"""
+    cacheable = sale['status'] in FINISHED_SALE_STATUSES
+    data = _read_cached_receipt(sale, fmt) if cacheable else None
+    if data is None:
+        data = render_receipt(sale, fmt)
+        if cacheable:
+            _write_cached_receipt(sale, fmt, data)
+    return data
+
+_receipt_executor = None
+_receipt_executor_lock = threading.Lock()
+
+def get_receipt_executor():
+    """Return the shared receipt render pool, creating it on first use.
+
+    Workers are started from a forkserver (spawn where unavailable) instead
+    of being forked from this threaded server, so they never inherit a lock
+    another request thread was holding.
+    """
+    global _receipt_executor
+    with _receipt_executor_lock:
+        if _receipt_executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _receipt_executor = ProcessPoolExecutor(max_workers=RECEIPT_CONFIG['workers'],
+                                                    mp_context=multiprocessing.get_context(method))
+        return _receipt_executor
+
+def _discard_receipt_executor(executor):
+    """Drop a broken pool so the next export starts a fresh one"""
+    global _receipt_executor
+    with _receipt_executor_lock:
+        if _receipt_executor is executor:
+            _receipt_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def render_receipts(sales, fmt):
+    """Yield (sale, receipt bytes) in order, rendering cache misses in the shared process pool"""
+    pending = []
+    for sale in sales:
+        data = _read_cached_receipt(sale, fmt) if sale['status'] in FINISHED_SALE_STATUSES else None
+        pending.append((sale, data))
+    
+    missing = [sale for sale, data in pending if data is None]
+    if len(missing) > 1:
+        executor = get_receipt_executor()
+        rendered = executor.map(_render_receipt_job, [(sale, fmt) for sale in missing],
+                                chunksize=max(1, len(missing) // (RECEIPT_CONFIG['workers'] * 4)))
+    else:
+        executor = None
+        rendered = (render_receipt(sale, fmt) for sale in missing)
+    
+    try:
+        for sale, data in pending:
+            if data is None:
+                data = next(rendered)
+                if sale['status'] in FINISHED_SALE_STATUSES:
+                    _write_cached_receipt(sale, fmt, data)
+            yield sale, data
+    except BrokenProcessPool:
+        _discard_receipt_executor(executor)
+        raise
+    finally:
+        # Cancels this export's queued jobs; the pool itself is shared
+        rendered.close()
+
+def load_sales_with_items(cursor, start_date, end_date):
+    """Load every sale in a date range with its items using two range queries"""
+    cursor.execute("""
+        SELECT s.*, c.customer_name, c.phone, c.address
+        FROM sales s
+        LEFT JOIN customers c ON s.customer_id = c.customer_id
+        WHERE s.sale_date >= %s AND s.sale_date < DATE_ADD(%s, INTERVAL 1 DAY)
+        ORDER BY s.sale_date, s.sale_id
+    """, (start_date, end_date))
+    sales = cursor.fetchall()
+    
+    cursor.execute("""
+        SELECT si.*, p.product_name
+        FROM sale_items si
+        JOIN products p ON si.product_id = p.product_id
+        WHERE si.sale_date >= %s AND si.sale_date < DATE_ADD(%s, INTERVAL 1 DAY)
+        ORDER BY si.sale_item_id
+    """, (start_date, end_date))
+    items = defaultdict(list)
+    for item in cursor.fetchall():
+        items[item['sale_id']].append(item)
+    
+    for sale in sales:
+        sale['items'] = items[sale['sale_id']]
+    return sales
+
+class _ZipStream(io.RawIOBase):
+    """Write-only buffer that lets a ZipFile be streamed out chunk by chunk"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+@app.route('/api/sales/<int:sale_id>/receipt')
+def get_sale_receipt(sale_id):
+    """Get a rendered receipt for one sale (format: html, pdf or png)"""
+    fmt = request.args.get('format', 'html')
+    if fmt not in RECEIPT_FORMATS:
+        return jsonify({'error': 'Unsupported receipt format'}), 400
+    
+    sale = query_cache.get(query_cache.make_key('sale_details', (sale_id,)))
+    if sale is None:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        try:
+            sale = fetch_sale_details(cursor, sale_id)
+        except Error as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            cursor.close()
+            conn.close()
+    
+    if not sale:
+        return jsonify({'error': 'Sale not found'}), 404
+    
+    return Response(get_receipt(sale, fmt), mimetype=RECEIPT_FORMATS[fmt])
+
+@app.route('/api/receipts')
+def get_bulk_receipts():
+    """Render receipts for every sale in a date range as one streamed zip archive"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    fmt = request.args.get('format', 'pdf')
+    
+    try:
+        datetime.strptime(start_date or '', '%Y-%m-%d')
+        datetime.strptime(end_date or '', '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date are required (YYYY-MM-DD)'}), 400
+    if fmt not in RECEIPT_FORMATS:
+        return jsonify({'error': 'Unsupported receipt format'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        sales = load_sales_with_items(cursor, start_date, end_date)
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cursor.close()
+        conn.close()
+    
+    def generate():
+        stream = _ZipStream()
+        with zipfile.ZipFile(stream, 'w') as archive:
+            for sale, data in render_receipts(sales, fmt):
+                name = re.sub(r'[^A-Za-z0-9_-]', '_', sale['invoice_number'])
+                # PDF and PNG output is already compressed
+                archive.writestr(f"{name}.{fmt}", data,
+                                 compress_type=zipfile.ZIP_DEFLATED if fmt == 'html' else zipfile.ZIP_STORED)
+                yield stream.drain()
+        yield stream.drain()
+    
+    filename = f"receipts_{start_date}_{end_date}.zip"
+    return Response(stream_with_context(generate()), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 # ==================== SALES DASHBOARD & REPORTS ====================
 
 @app.route('/reports')
 def reports():
     """Sales reports page"""
-    return render_template('reports.html')
+    return render_page('reports.html')
 
 @app.route('/api/reports/sales')
 def get_sales_report():
@@ -752,7 +2531,7 @@ def get_sales_report():
                        COUNT(*) as total_transactions,
                        SUM(total_amount) as total_sales
                 FROM sales
-                WHERE DATE(sale_date) = CURDATE()
+                WHERE sale_date >= CURDATE() AND sale_date < CURDATE() + INTERVAL 1 DAY
                 GROUP BY DATE(sale_date)
             """)
         elif report_type == 'monthly':
@@ -761,8 +2540,7 @@ def get_sales_report():
                        COUNT(*) as total_transactions,
                        SUM(total_amount) as total_sales
                 FROM sales
-                WHERE MONTH(sale_date) = MONTH(CURDATE())
-                AND YEAR(sale_date) = YEAR(CURDATE())
+                WHERE sale_date >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
                 GROUP BY DATE(sale_date)
                 ORDER BY date
             """)
@@ -772,7 +2550,7 @@ def get_sales_report():
                        COUNT(*) as total_transactions,
                        SUM(total_amount) as total_sales
                 FROM sales
-                WHERE YEAR(sale_date) = YEAR(CURDATE())
+                WHERE sale_date >= MAKEDATE(YEAR(CURDATE()), 1)
                 GROUP BY MONTH(sale_date)
                 ORDER BY month
             """)
@@ -829,6 +2607,265 @@ def get_chart_data():
         cursor.close()
         conn.close()
 
+# ==================== PARTITIONS & ARCHIVING ====================
+
+# Archive configuration. Months older than 'retention_months' are moved from
+# the partitioned tables to Parquet files under 'path'.
+ARCHIVE_CONFIG = {
+    'path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'),
+    'retention_months': 24,
+    'months_ahead': 3,
+    'batch_size': 50000       # Rows read and written per Parquet row group
+}
+
+# Monthly partitioned tables and their partition column
+PARTITIONED_TABLES = {
+    'sales': 'sale_date',
+    'sale_items': 'sale_date',
+    'transactions': 'transaction_date'
+}
+
+MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+def _add_months(month, count):
+    """Return the first day of the month `count` months after `month`"""
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+def _get_partitions(cursor, table):
+    """Return [(partition_name, upper_bound)] in order; upper_bound is None for MAXVALUE"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    partitions = []
+    for name, description in cursor.fetchall():
+        bound = None
+        if description and description != 'MAXVALUE':
+            bound = datetime.strptime(description.strip("'")[:10], '%Y-%m-%d').date()
+        partitions.append((name, bound))
+    return partitions
+
+def ensure_partitions(conn, months_ahead):
+    """Split the catch-all partition into monthly partitions up to `months_ahead` months out.
+
+    Returns the names of the partitions created.
+    """
+    cursor = conn.cursor()
+    created = []
+    try:
+        target = _add_months(date.today().replace(day=1), months_ahead + 1)
+        for table, column in PARTITIONED_TABLES.items():
+            partitions = _get_partitions(cursor, table)
+            last_name, last_bound = [p for p in partitions if p[1]][-1]
+            
+            if MONTH_PARTITION.match(last_name):
+                month = last_bound
+            else:
+                # First run: start at the oldest row still in the catch-all partition
+                cursor.execute(f"SELECT MIN({column}) FROM {table} PARTITION (p_future)")
+                oldest = cursor.fetchone()[0]
+                month = (oldest.date() if oldest else date.today()).replace(day=1)
+            
+            new_partitions = []
+            while month < target:
+                upper = _add_months(month, 1)
+                new_partitions.append(
+                    f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper.isoformat()}')")
+                created.append(f"{table}.p{month:%Y%m}")
+                month = upper
+            
+            if new_partitions:
+                cursor.execute(f"""
+                    ALTER TABLE {table} REORGANIZE PARTITION p_future INTO (
+                        {', '.join(new_partitions)},
+                        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+                    )
+                """)
+    finally:
+        cursor.close()
+    
+    return created
+
+def _frame_records(frame):
+    """Convert a DataFrame to JSON-ready dicts with None for missing values"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+def _read_archive(path, **kwargs):
+    """Read an archived Parquet file keeping nullable integer columns as ints"""
+    return pd.read_parquet(path, dtype_backend='numpy_nullable', **kwargs)
+
+# Arrow types for MySQL result columns; anything else is stored as a string.
+# Every money column in the schema is DECIMAL(x, 2).
+ARROW_TYPES = {
+    FieldType.TINY: pa.int64(),
+    FieldType.SHORT: pa.int64(),
+    FieldType.INT24: pa.int64(),
+    FieldType.LONG: pa.int64(),
+    FieldType.LONGLONG: pa.int64(),
+    FieldType.FLOAT: pa.float64(),
+    FieldType.DOUBLE: pa.float64(),
+    FieldType.DECIMAL: pa.decimal128(18, 2),
+    FieldType.NEWDECIMAL: pa.decimal128(18, 2),
+    FieldType.DATE: pa.date32(),
+    FieldType.DATETIME: pa.timestamp('s'),
+    FieldType.TIMESTAMP: pa.timestamp('s')
+}
+
+def _write_parquet(cursor, path, batch_size):
+    """Stream the cursor's result set to a zstd-compressed Parquet file in batches.
+
+    The schema comes from the result's column types rather than the data,
+    so batches with only NULLs in a column still line up. The file is
+    replaced atomically. Returns the number of rows written.
+    """
+    schema = pa.schema([(column[0], ARROW_TYPES.get(column[1], pa.string()))
+                        for column in cursor.description])
+    tmp_path = path + '.tmp'
+    written = 0
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.write_batch(pa.record_batch(
+                [pa.array([row[i] for row in rows], type=field.type)
+                 for i, field in enumerate(schema)],
+                schema=schema))
+            written += len(rows)
+    os.replace(tmp_path, path)
+    return written
+
+def archive_period(conn, partition):
+    """Export one monthly partition of each table to Parquet, then drop it.
+
+    Sales are exported with customer details and items with product names,
+    so archived invoices stay readable after those rows change. The month's
+    lot allocations are archived alongside and deleted from the hot table.
+    """
+    year, month = MONTH_PARTITION.match(partition).groups()
+    period = f"{year}-{month}"
+    archive_path = os.path.join(ARCHIVE_CONFIG['path'], period)
+    os.makedirs(archive_path, exist_ok=True)
+    
+    exports = {
+        'sales': f"""
+            SELECT s.*, c.customer_name, c.phone, c.address
+            FROM sales PARTITION ({partition}) s
+            LEFT JOIN customers c ON s.customer_id = c.customer_id
+            ORDER BY s.sale_id
+        """,
+        'sale_items': f"""
+            SELECT si.*, p.product_name
+            FROM sale_items PARTITION ({partition}) si
+            LEFT JOIN products p ON si.product_id = p.product_id
+            ORDER BY si.sale_id, si.sale_item_id
+        """,
+        'transactions': f"""
+            SELECT * FROM transactions PARTITION ({partition})
+            ORDER BY transaction_id
+        """,
+        'sale_lot_allocations': f"""
+            SELECT a.* FROM sale_lot_allocations a
+            JOIN sales PARTITION ({partition}) s ON a.sale_id = s.sale_id
+            ORDER BY a.sale_id, a.product_id, a.lot_id
+        """
+    }
+    batch_size = ARCHIVE_CONFIG['batch_size']
+    
+    cursor = conn.cursor()
+    try:
+        for table, query in exports.items():
+            cursor.execute(query)
+            _write_parquet(cursor, os.path.join(archive_path, f'{table}.parquet'), batch_size)
+        
+        cursor.execute(f"""
+            SELECT MIN(sale_id), MAX(sale_id), COUNT(*) FROM sales PARTITION ({partition})
+        """)
+        min_sale_id, max_sale_id, sale_count = cursor.fetchone()
+        
+        cursor.execute("""
+            INSERT INTO archived_periods (period, min_sale_id, max_sale_id, sale_count, archive_path)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE min_sale_id = VALUES(min_sale_id),
+                                    max_sale_id = VALUES(max_sale_id),
+                                    sale_count = VALUES(sale_count),
+                                    archive_path = VALUES(archive_path)
+        """, (period, min_sale_id, max_sale_id, sale_count, archive_path))
+        conn.commit()
+        
+        # Allocations aren't partitioned; delete them a sale id range at a time
+        if sale_count:
+            for low in range(min_sale_id, max_sale_id + 1, batch_size):
+                cursor.execute(f"""
+                    DELETE a FROM sale_lot_allocations a
+                    JOIN sales PARTITION ({partition}) s ON a.sale_id = s.sale_id
+                    WHERE a.sale_id BETWEEN %s AND %s
+                """, (low, low + batch_size - 1))
+                conn.commit()
+        
+        # DROP PARTITION discards the rows without scanning them
+        for table in PARTITIONED_TABLES:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {partition}")
+    finally:
+        cursor.close()
+    
+    return period, sale_count
+
+def archive_closed_periods(conn, retention_months):
+    """Archive every monthly partition that ended more than `retention_months` ago"""
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    cursor = conn.cursor()
+    try:
+        closed = [name for name, bound in _get_partitions(cursor, 'sales')
+                  if bound and bound <= cutoff and MONTH_PARTITION.match(name)]
+    finally:
+        cursor.close()
+    
+    return [archive_period(conn, partition) for partition in closed]
+
+def load_archived_sale(cursor, sale_id):
+    """Read-through lookup of an archived sale with its items, or None"""
+    cursor.execute("""
+        SELECT archive_path FROM archived_periods
+        WHERE %s BETWEEN min_sale_id AND max_sale_id
+    """, (sale_id,))
+    
+    for row in cursor.fetchall():
+        path = row['archive_path']
+        sales = _read_archive(os.path.join(path, 'sales.parquet'),
+                              filters=[('sale_id', '==', sale_id)])
+        if sales.empty:
+            continue
+        
+        items = _read_archive(os.path.join(path, 'sale_items.parquet'),
+                              filters=[('sale_id', '==', sale_id)])
+        sale = _frame_records(sales)[0]
+        sale['items'] = _frame_records(items)
+        return sale
+    
+    return None
+
+@app.cli.command('partitions')
+def partitions_command():
+    """Create upcoming monthly partitions and archive closed months (e.g. nightly)"""
+    conn = get_db_connection()
+    if not conn:
+        print("Error connecting to MySQL")
+        return
+    
+    try:
+        created = ensure_partitions(conn, ARCHIVE_CONFIG['months_ahead'])
+        archived = archive_closed_periods(conn, ARCHIVE_CONFIG['retention_months'])
+    finally:
+        conn.close()
+    
+    print(f"Created {len(created)} partitions")
+    for period, sale_count in archived:
+        print(f"Archived {period}: {sale_count} sales")
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(404)
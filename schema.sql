@@ -6,12 +6,18 @@ CREATE DATABASE IF NOT EXISTS grocery_store;
 USE grocery_store;
 
 -- Drop tables if exists (for fresh setup)
+DROP TABLE IF EXISTS sale_lot_allocations;
+DROP TABLE IF EXISTS product_lots;
 DROP TABLE IF EXISTS sale_items;
 DROP TABLE IF EXISTS sales;
 DROP TABLE IF EXISTS transactions;
 DROP TABLE IF EXISTS products;
 DROP TABLE IF EXISTS customers;
 DROP TABLE IF EXISTS categories;
+DROP TABLE IF EXISTS batch_job_state;
+DROP TABLE IF EXISTS archived_periods;
+DROP TABLE IF EXISTS change_log;
+DROP TABLE IF EXISTS change_log_version;
 
 -- Categories table
 CREATE TABLE categories (
@@ -31,13 +37,28 @@ CREATE TABLE products (
     cost_price DECIMAL(10, 2) DEFAULT 0,
     quantity INT NOT NULL DEFAULT 0,
     low_stock_threshold INT DEFAULT 10,
-    expiry_date DATE,
+    expiry_date DATE,                       -- Next lot expiry for products tracked in lots
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (category_id) REFERENCES categories(category_id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Product lots (stock received per batch, allocated first-expiry-first-out)
+CREATE TABLE product_lots (
+    lot_id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    lot_number VARCHAR(50),
+    quantity_received INT NOT NULL,
+    quantity_remaining INT NOT NULL,
+    expiry_date DATE,
+    status ENUM('Active', 'Depleted', 'Expired') DEFAULT 'Active',
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE,
+    INDEX idx_lots_status_expiry (status, expiry_date),
+    INDEX idx_lots_product_expiry (product_id, status, expiry_date)
+) ENGINE=InnoDB;
+
 -- Customers table
 CREATE TABLE customers (
     customer_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -47,51 +68,126 @@ CREATE TABLE customers (
     address TEXT,
     total_purchases DECIMAL(12, 2) DEFAULT 0,
     loyalty_points INT DEFAULT 0,
+    purchase_count INT DEFAULT 0,
+    rfm_monetary DECIMAL(12, 2) DEFAULT 0,
+    last_purchase_date TIMESTAMP NULL,
+    rfm_score CHAR(3),
+    rfm_segment VARCHAR(30),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
+-- Sales, sale items and transactions are range partitioned by month on their
+-- date column. MySQL does not allow foreign keys on partitioned tables and
+-- requires the partition column in every unique key, so references to
+-- customers/products/sales are enforced by the application instead.
+-- Only a catch-all partition is created here; `flask --app app partitions`
+-- splits it into monthly partitions and archives closed months.
+
 -- Sales table (main sale record)
 CREATE TABLE sales (
-    sale_id INT AUTO_INCREMENT PRIMARY KEY,
+    sale_id INT AUTO_INCREMENT,
     customer_id INT,
-    sale_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sale_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     subtotal DECIMAL(10, 2) NOT NULL,
     discount_amount DECIMAL(10, 2) DEFAULT 0,
     tax_amount DECIMAL(10, 2) DEFAULT 0,
     total_amount DECIMAL(10, 2) NOT NULL,
     payment_method ENUM('Cash', 'UPI', 'Card') NOT NULL,
-    invoice_number VARCHAR(50) UNIQUE NOT NULL,
+    invoice_number VARCHAR(50) NOT NULL,
     status ENUM('Completed', 'Refunded', 'Cancelled') DEFAULT 'Completed',
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE SET NULL
-) ENGINE=InnoDB;
+    PRIMARY KEY (sale_id, sale_date),
+    UNIQUE KEY uq_sales_invoice (invoice_number, sale_date)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS(sale_date) (
+    PARTITION p_start VALUES LESS THAN ('2000-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
 -- Sale items table (individual items in a sale)
+-- sale_date is copied from the parent sale so items share its partition
 CREATE TABLE sale_items (
-    sale_item_id INT AUTO_INCREMENT PRIMARY KEY,
+    sale_item_id INT AUTO_INCREMENT,
     sale_id INT NOT NULL,
+    sale_date DATETIME NOT NULL,
     product_id INT NOT NULL,
     quantity INT NOT NULL,
     unit_price DECIMAL(10, 2) NOT NULL,
     total_price DECIMAL(10, 2) NOT NULL,
-    FOREIGN KEY (sale_id) REFERENCES sales(sale_id) ON DELETE CASCADE,
-    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE RESTRICT
-) ENGINE=InnoDB;
+    PRIMARY KEY (sale_item_id, sale_date)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS(sale_date) (
+    PARTITION p_start VALUES LESS THAN ('2000-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
 -- Transactions table (payment tracking)
 CREATE TABLE transactions (
-    transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+    transaction_id INT AUTO_INCREMENT,
     sale_id INT,
-    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    transaction_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     amount DECIMAL(10, 2) NOT NULL,
     payment_method ENUM('Cash', 'UPI', 'Card') NOT NULL,
     transaction_reference VARCHAR(100),
     status ENUM('Completed', 'Refunded', 'Failed') DEFAULT 'Completed',
-    FOREIGN KEY (sale_id) REFERENCES sales(sale_id) ON DELETE SET NULL
+    PRIMARY KEY (transaction_id, transaction_date)
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS(transaction_date) (
+    PARTITION p_start VALUES LESS THAN ('2000-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Lots each sale was allocated from (sales are partitioned, so no foreign keys)
+CREATE TABLE sale_lot_allocations (
+    sale_id INT NOT NULL,
+    product_id INT NOT NULL,
+    lot_id INT NOT NULL,
+    quantity INT NOT NULL,
+    PRIMARY KEY (sale_id, product_id, lot_id),
+    INDEX idx_allocations_lot (lot_id)
+) ENGINE=InnoDB;
+
+-- Archived periods (months moved from the partitioned tables to archive files)
+CREATE TABLE archived_periods (
+    period CHAR(7) PRIMARY KEY,
+    min_sale_id INT,
+    max_sale_id INT,
+    sale_count INT NOT NULL DEFAULT 0,
+    archive_path VARCHAR(255) NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archived_sale_range (min_sale_id, max_sale_id)
+) ENGINE=InnoDB;
+
+-- Batch job state (high-water marks for incremental batch jobs)
+CREATE TABLE batch_job_state (
+    job_name VARCHAR(50) PRIMARY KEY,
+    high_water_mark BIGINT NOT NULL DEFAULT 0,
+    last_run_at TIMESTAMP NULL
 ) ENGINE=InnoDB;
 
+-- Change log (versioned feed of changed catalog/customer/stock rows)
+CREATE TABLE change_log (
+    version BIGINT NOT NULL,
+    entity ENUM('product', 'category', 'customer', 'stock') NOT NULL,
+    entity_id INT NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (version, entity, entity_id),
+    INDEX idx_change_log_entity (entity, entity_id, version),
+    INDEX idx_change_log_changed (changed_at)
+) ENGINE=InnoDB;
+
+-- Change log version counter. Writers lock this row until commit, so
+-- versions become visible in order.
+CREATE TABLE change_log_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    compacted_version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT INTO change_log_version (id, version, compacted_version) VALUES (1, 0, 0);
+
 -- Insert default categories
 INSERT INTO categories (category_name, description) VALUES
 ('Fruits & Vegetables', 'Fresh fruits and vegetables'),
@@ -128,5 +224,11 @@ INSERT INTO customers (customer_name, phone, email, address) VALUES
 CREATE INDEX idx_products_name ON products(product_name);
 CREATE INDEX idx_products_barcode ON products(barcode);
 CREATE INDEX idx_customers_phone ON customers(phone);
+CREATE INDEX idx_customers_segment ON customers(rfm_segment);
 CREATE INDEX idx_sales_date ON sales(sale_date);
 CREATE INDEX idx_sales_invoice ON sales(invoice_number);
+CREATE INDEX idx_sales_customer ON sales(customer_id, sale_date);
+CREATE INDEX idx_sale_items_sale ON sale_items(sale_id);
+CREATE INDEX idx_sale_items_product ON sale_items(product_id);
+CREATE INDEX idx_transactions_sale ON transactions(sale_id);
+CREATE INDEX idx_transactions_date ON transactions(transaction_date);
@@ -0,0 +1,307 @@
+/**
+ * Grocery Store Management System - Billing / POS page
+ */
+
+let cart = [];
+let customers = [];
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadCustomers();
+    
+    document.getElementById('productSearch').addEventListener('input', debounce(searchProducts, 300));
+    document.getElementById('clearCart').addEventListener('click', clearCart);
+    document.getElementById('applyDiscount').addEventListener('click', calculateTotals);
+    document.getElementById('applyTax').addEventListener('click', calculateTotals);
+    document.getElementById('completeSale').addEventListener('click', completeSale);
+    document.getElementById('newCustomerForm').addEventListener('submit', addNewCustomer);
+});
+
+async function loadCustomers() {
+    try {
+        await ChangeFeed.start();
+        const response = await fetch('/api/customers');
+        customers = await response.json();
+        renderCustomerOptions();
+    } catch (error) {
+        console.error('Error loading customers:', error);
+    }
+}
+
+// Apply only the customers changed since the last load instead of refetching
+async function syncCustomers() {
+    try {
+        const changes = await ChangeFeed.sync();
+        if (!changes) {
+            return loadCustomers();
+        }
+        
+        customers = ChangeFeed.apply(customers, changes.customers, changes.deleted.customers, 'customer_id');
+        customers.sort((a, b) => a.customer_name.localeCompare(b.customer_name));
+        renderCustomerOptions();
+    } catch (error) {
+        console.error('Error syncing customers:', error);
+    }
+}
+
+function renderCustomerOptions() {
+    const select = document.getElementById('customerSelect');
+    const selected = select.value;
+    
+    const options = customers.map(c => 
+        `<option value="${c.customer_id}">${c.customer_name} - ${c.phone}</option>`
+    ).join('');
+    select.innerHTML = '<option value="">Walk-in Customer</option>' + options;
+    select.value = selected;
+}
+
+async function searchProducts() {
+    const query = document.getElementById('productSearch').value;
+    const resultsDiv = document.getElementById('searchResults');
+    
+    if (query.length < 2) {
+        resultsDiv.innerHTML = '';
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/products/search?q=${encodeURIComponent(query)}`);
+        const products = await response.json();
+        
+        if (products.length === 0) {
+            resultsDiv.innerHTML = '<div class="list-group-item text-muted">No products found</div>';
+            return;
+        }
+        
+        resultsDiv.innerHTML = products.map(p => `
+            <button class="list-group-item list-group-item-action" onclick="addToCart(${p.product_id}, '${p.product_name}', ${p.price}, ${p.quantity})">
+                <div class="d-flex justify-content-between align-items-center">
+                    <div>
+                        <strong>${p.product_name}</strong>
+                        <br><small class="text-muted">${p.barcode || 'No barcode'}</small>
+                    </div>
+                    <div class="text-end">
+                        <span class="badge bg-primary">₹${parseFloat(p.price).toFixed(2)}</span>
+                        <br><small class="text-${p.quantity < 10 ? 'danger' : 'success'}">Stock: ${p.quantity}</small>
+                    </div>
+                </div>
+            </button>
+        `).join('');
+    } catch (error) {
+        console.error('Error searching products:', error);
+    }
+}
+
+function addToCart(productId, productName, price, availableStock) {
+    const existingItem = cart.find(item => item.product_id === productId);
+    
+    if (existingItem) {
+        if (existingItem.quantity < availableStock) {
+            existingItem.quantity++;
+            existingItem.total_price = existingItem.quantity * existingItem.price;
+        } else {
+            showToast('Maximum stock reached', 'warning');
+            return;
+        }
+    } else {
+        cart.push({
+            product_id: productId,
+            product_name: productName,
+            price: price,
+            quantity: 1,
+            total_price: price
+        });
+    }
+    
+    document.getElementById('searchResults').innerHTML = '';
+    document.getElementById('productSearch').value = '';
+    renderCart();
+    calculateTotals();
+}
+
+function renderCart() {
+    const tbody = document.querySelector('#cartTable tbody');
+    
+    if (cart.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="5" class="text-center text-muted">Cart is empty</td></tr>';
+        return;
+    }
+    
+    tbody.innerHTML = cart.map((item, index) => `
+        <tr>
+            <td>${item.product_name}</td>
+            <td>₹${item.price.toFixed(2)}</td>
+            <td>
+                <button class="btn btn-sm btn-outline-secondary" onclick="updateQuantity(${index}, -1)">-</button>
+                <span class="mx-2">${item.quantity}</span>
+                <button class="btn btn-sm btn-outline-secondary" onclick="updateQuantity(${index}, 1)">+</button>
+            </td>
+            <td>₹${item.total_price.toFixed(2)}</td>
+            <td>
+                <button class="btn btn-sm btn-danger" onclick="removeFromCart(${index})">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `).join('');
+}
+
+function updateQuantity(index, change) {
+    cart[index].quantity += change;
+    if (cart[index].quantity <= 0) {
+        cart.splice(index, 1);
+    } else {
+        cart[index].total_price = cart[index].quantity * cart[index].price;
+    }
+    renderCart();
+    calculateTotals();
+}
+
+function removeFromCart(index) {
+    cart.splice(index, 1);
+    renderCart();
+    calculateTotals();
+}
+
+function clearCart() {
+    cart = [];
+    renderCart();
+    calculateTotals();
+    document.getElementById('customerSelect').value = '';
+}
+
+function calculateTotals() {
+    const subtotal = cart.reduce((sum, item) => sum + item.total_price, 0);
+    const discountPercent = parseFloat(document.getElementById('discountPercent').value) || 0;
+    const discountAmount = subtotal * (discountPercent / 100);
+    const afterDiscount = subtotal - discountAmount;
+    const taxPercent = parseFloat(document.getElementById('taxPercent').value) || 0;
+    const taxAmount = afterDiscount * (taxPercent / 100);
+    const total = afterDiscount + taxAmount;
+    
+    document.getElementById('subtotal').value = subtotal.toFixed(2);
+    document.getElementById('discountAmount').value = discountAmount.toFixed(2);
+    document.getElementById('taxAmount').value = taxAmount.toFixed(2);
+    document.getElementById('totalAmount').value = total.toFixed(2);
+}
+
+async function completeSale() {
+    if (cart.length === 0) {
+        showToast('Cart is empty', 'warning');
+        return;
+    }
+    
+    const saleData = {
+        customer_id: document.getElementById('customerSelect').value || null,
+        items: cart,
+        subtotal: parseFloat(document.getElementById('subtotal').value),
+        discount_amount: parseFloat(document.getElementById('discountAmount').value),
+        tax_amount: parseFloat(document.getElementById('taxAmount').value),
+        total_amount: parseFloat(document.getElementById('totalAmount').value),
+        payment_method: document.getElementById('paymentMethod').value,
+        notes: document.getElementById('billNotes').value
+    };
+    
+    try {
+        const response = await fetch('/api/sales', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(saleData)
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            showInvoice(data.invoice_number, saleData);
+            clearCart();
+            resetBillForm();
+            showToast('Sale completed successfully!', 'success');
+        } else {
+            showToast(data.error || 'Error completing sale', 'error');
+        }
+    } catch (error) {
+        showToast('Error completing sale', 'error');
+    }
+}
+
+function showInvoice(invoiceNumber, saleData) {
+    const invoiceContent = document.getElementById('invoiceContent');
+    
+    let itemsHtml = saleData.items.map(item => `
+        <tr>
+            <td>${item.product_name}</td>
+            <td>${item.quantity}</td>
+            <td>₹${item.price.toFixed(2)}</td>
+            <td>₹${item.total_price.toFixed(2)}</td>
+        </tr>
+    `).join('');
+    
+    invoiceContent.innerHTML = `
+        <div class="invoice">
+            <h4 class="text-center mb-4">Grocery Store</h4>
+            <p class="text-center text-muted">Invoice: ${invoiceNumber}</p>
+            <p class="text-center text-muted">Date: ${new Date().toLocaleString()}</p>
+            <table class="table table-bordered">
+                <thead>
+                    <tr>
+                        <th>Product</th>
+                        <th>Qty</th>
+                        <th>Price</th>
+                        <th>Total</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${itemsHtml}
+                </tbody>
+            </table>
+            <div class="text-end">
+                <p>Subtotal: ₹${saleData.subtotal.toFixed(2)}</p>
+                <p>Discount: -₹${saleData.discount_amount.toFixed(2)}</p>
+                <p>Tax: ₹${saleData.tax_amount.toFixed(2)}</p>
+                <h4>Total: ₹${saleData.total_amount.toFixed(2)}</h4>
+                <p class="text-muted">Payment: ${saleData.payment_method}</p>
+            </div>
+        </div>
+    `;
+    
+    new bootstrap.Modal(document.getElementById('invoiceModal')).show();
+}
+
+function resetBillForm() {
+    document.getElementById('discountPercent').value = 0;
+    document.getElementById('taxPercent').value = 0;
+    document.getElementById('paymentMethod').value = 'Cash';
+    document.getElementById('billNotes').value = '';
+    calculateTotals();
+}
+
+async function addNewCustomer(e) {
+    e.preventDefault();
+    
+    const customerData = {
+        customer_name: document.getElementById('customerName').value,
+        phone: document.getElementById('customerPhone').value,
+        email: document.getElementById('customerEmail').value,
+        address: document.getElementById('customerAddress').value
+    };
+    
+    try {
+        const response = await fetch('/api/customers', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(customerData)
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            bootstrap.Modal.getInstance(document.getElementById('newCustomerModal')).hide();
+            document.getElementById('newCustomerForm').reset();
+            syncCustomers();
+            showToast('Customer added successfully', 'success');
+        } else {
+            showToast(data.error || 'Error adding customer', 'error');
+        }
+    } catch (error) {
+        showToast('Error adding customer', 'error');
+    }
+}
@@ -0,0 +1,190 @@
+/**
+ * Grocery Store Management System - Customer management page
+ */
+
+let customers = [];
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadCustomers();
+    
+    document.getElementById('searchCustomer').addEventListener('input', debounce(filterCustomers, 300));
+    document.getElementById('customerForm').addEventListener('submit', saveCustomer);
+    document.getElementById('confirmDelete').addEventListener('click', deleteCustomer);
+    
+    document.getElementById('customerModal').addEventListener('hidden.bs.modal', resetCustomerForm);
+});
+
+async function loadCustomers() {
+    try {
+        await ChangeFeed.start();
+        const response = await fetch('/api/customers');
+        customers = await response.json();
+        renderCustomers(customers);
+    } catch (error) {
+        console.error('Error loading customers:', error);
+    }
+}
+
+// Apply only the customers changed since the last load instead of refetching
+async function syncCustomers() {
+    try {
+        const changes = await ChangeFeed.sync();
+        if (!changes) {
+            return loadCustomers();
+        }
+        
+        customers = ChangeFeed.apply(customers, changes.customers, changes.deleted.customers, 'customer_id');
+        customers.sort((a, b) => a.customer_name.localeCompare(b.customer_name));
+        filterCustomers();
+    } catch (error) {
+        console.error('Error syncing customers:', error);
+    }
+}
+
+function filterCustomers() {
+    const search = document.getElementById('searchCustomer').value.toLowerCase();
+    const filtered = customers.filter(c => 
+        c.customer_name.toLowerCase().includes(search) || 
+        c.phone.includes(search)
+    );
+    renderCustomers(filtered);
+}
+
+function renderCustomers(data) {
+    const tbody = document.querySelector('#customersTable tbody');
+    
+    if (data.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted">No customers found</td></tr>';
+        return;
+    }
+    
+    tbody.innerHTML = data.map(c => `
+        <tr>
+            <td>${c.customer_id}</td>
+            <td><strong>${c.customer_name}</strong></td>
+            <td>${c.phone}</td>
+            <td>${c.email || '-'}</td>
+            <td>₹${parseFloat(c.total_purchases || 0).toFixed(2)}</td>
+            <td>${c.updated_at ? new Date(c.updated_at).toLocaleDateString() : '-'}</td>
+            <td>
+                <button class="btn btn-sm btn-info" onclick="viewHistory(${c.customer_id}, '${c.customer_name}')" title="View History">
+                    <i class="fas fa-history"></i>
+                </button>
+                <button class="btn btn-sm btn-primary" onclick="editCustomer(${c.customer_id})" title="Edit">
+                    <i class="fas fa-edit"></i>
+                </button>
+                <button class="btn btn-sm btn-danger" onclick="confirmDelete(${c.customer_id})" title="Delete">
+                    <i class="fas fa-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `).join('');
+}
+
+function editCustomer(customerId) {
+    const customer = customers.find(c => c.customer_id === customerId);
+    if (customer) {
+        document.getElementById('customerId').value = customer.customer_id;
+        document.getElementById('customerName').value = customer.customer_name;
+        document.getElementById('customerPhone').value = customer.phone;
+        document.getElementById('customerEmail').value = customer.email || '';
+        document.getElementById('customerAddress').value = customer.address || '';
+        
+        document.getElementById('customerModalTitle').textContent = 'Edit Customer';
+        new bootstrap.Modal(document.getElementById('customerModal')).show();
+    }
+}
+
+async function viewHistory(customerId, customerName) {
+    document.getElementById('customerNameDisplay').textContent = `Customer: ${customerName}`;
+    
+    try {
+        const response = await fetch(`/api/customers/${customerId}/history`);
+        const history = await response.json();
+        
+        const tbody = document.querySelector('#historyTable tbody');
+        
+        if (history.length === 0) {
+            tbody.innerHTML = '<tr><td colspan="5" class="text-center text-muted">No purchase history</td></tr>';
+        } else {
+            tbody.innerHTML = history.map(h => `
+                <tr>
+                    <td>${h.invoice_number}</td>
+                    <td>${new Date(h.sale_date).toLocaleDateString()}</td>
+                    <td>₹${parseFloat(h.total_amount).toFixed(2)}</td>
+                    <td>${h.payment_method}</td>
+                    <td><span class="badge bg-${h.status === 'Completed' ? 'success' : 'danger'}">${h.status}</span></td>
+                </tr>
+            `).join('');
+        }
+        
+        new bootstrap.Modal(document.getElementById('historyModal')).show();
+    } catch (error) {
+        console.error('Error loading history:', error);
+    }
+}
+
+function confirmDelete(customerId) {
+    document.getElementById('deleteCustomerId').value = customerId;
+    new bootstrap.Modal(document.getElementById('deleteModal')).show();
+}
+
+async function deleteCustomer() {
+    const customerId = document.getElementById('deleteCustomerId').value;
+    
+    try {
+        const response = await fetch(`/api/customers/${customerId}`, { method: 'DELETE' });
+        const data = await response.json();
+        
+        if (response.ok) {
+            bootstrap.Modal.getInstance(document.getElementById('deleteModal')).hide();
+            syncCustomers();
+            showToast('Customer deleted successfully', 'success');
+        } else {
+            showToast(data.error || 'Error deleting customer', 'error');
+        }
+    } catch (error) {
+        showToast('Error deleting customer', 'error');
+    }
+}
+
+async function saveCustomer(e) {
+    e.preventDefault();
+    
+    const customerId = document.getElementById('customerId').value;
+    const customerData = {
+        customer_name: document.getElementById('customerName').value,
+        phone: document.getElementById('customerPhone').value,
+        email: document.getElementById('customerEmail').value,
+        address: document.getElementById('customerAddress').value
+    };
+    
+    try {
+        const url = customerId ? `/api/customers/${customerId}` : '/api/customers';
+        const method = customerId ? 'PUT' : 'POST';
+        
+        const response = await fetch(url, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(customerData)
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            bootstrap.Modal.getInstance(document.getElementById('customerModal')).hide();
+            syncCustomers();
+            showToast('Customer saved successfully', 'success');
+        } else {
+            showToast(data.error || 'Error saving customer', 'error');
+        }
+    } catch (error) {
+        showToast('Error saving customer', 'error');
+    }
+}
+
+function resetCustomerForm() {
+    document.getElementById('customerForm').reset();
+    document.getElementById('customerId').value = '';
+    document.getElementById('customerModalTitle').textContent = 'Add New Customer';
+}
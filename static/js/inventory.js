@@ -0,0 +1,211 @@
+/**
+ * Grocery Store Management System - Inventory management page
+ */
+
+let categories = [];
+let products = [];
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadCategories();
+    loadProducts();
+    
+    document.getElementById('searchProduct').addEventListener('input', debounce(filterProducts, 300));
+    document.getElementById('categoryFilter').addEventListener('change', filterProducts);
+    document.getElementById('lowStockOnly').addEventListener('change', filterProducts);
+    document.getElementById('productForm').addEventListener('submit', saveProduct);
+    document.getElementById('confirmDelete').addEventListener('click', deleteProduct);
+    
+    document.getElementById('productModal').addEventListener('hidden.bs.modal', resetProductForm);
+});
+
+async function loadCategories() {
+    try {
+        const response = await fetch('/api/categories');
+        categories = await response.json();
+        
+        const categoryOptions = categories.map(c => `<option value="${c.category_id}">${c.category_name}</option>`).join('');
+        document.getElementById('categoryFilter').innerHTML = '<option value="">All Categories</option>' + categoryOptions;
+        document.getElementById('productCategory').innerHTML = '<option value="">Select Category</option>' + categoryOptions;
+    } catch (error) {
+        console.error('Error loading categories:', error);
+    }
+}
+
+async function loadProducts() {
+    try {
+        await ChangeFeed.start();
+        const response = await fetch('/api/products');
+        products = await response.json();
+        filterProducts();
+    } catch (error) {
+        console.error('Error loading products:', error);
+    }
+}
+
+// Apply only the rows changed since the last load instead of refetching
+async function syncProducts() {
+    try {
+        const changes = await ChangeFeed.sync();
+        if (!changes) {
+            return loadProducts();
+        }
+        
+        products = ChangeFeed.apply(products, changes.products, changes.deleted.products, 'product_id');
+        changes.stock.forEach(s => {
+            const product = products.find(p => p.product_id === s.product_id);
+            if (product) product.quantity = s.quantity;
+        });
+        products.sort((a, b) => a.product_name.localeCompare(b.product_name));
+        filterProducts();
+    } catch (error) {
+        console.error('Error syncing products:', error);
+    }
+}
+
+function filterProducts() {
+    const search = document.getElementById('searchProduct').value.toLowerCase();
+    const categoryId = document.getElementById('categoryFilter').value;
+    const lowStockOnly = document.getElementById('lowStockOnly').checked;
+    
+    const filtered = products.filter(p =>
+        (!search || p.product_name.toLowerCase().includes(search) ||
+            (p.barcode || '').toLowerCase().includes(search)) &&
+        (!categoryId || String(p.category_id) === categoryId) &&
+        (!lowStockOnly || p.quantity <= p.low_stock_threshold)
+    );
+    renderProducts(filtered);
+}
+
+function renderProducts(products) {
+    const tbody = document.querySelector('#productsTable tbody');
+    
+    if (products.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="9" class="text-center text-muted">No products found</td></tr>';
+        return;
+    }
+    
+    tbody.innerHTML = products.map(p => {
+        const isLowStock = p.quantity <= p.low_stock_threshold;
+        return `
+            <tr>
+                <td>${p.product_id}</td>
+                <td><strong>${p.product_name}</strong></td>
+                <td>${p.category_name || '-'}</td>
+                <td>${p.barcode || '-'}</td>
+                <td>₹${parseFloat(p.price).toFixed(2)}</td>
+                <td>₹${parseFloat(p.cost_price || 0).toFixed(2)}</td>
+                <td>
+                    <span class="badge ${isLowStock ? 'bg-danger' : 'bg-success'}">
+                        ${p.quantity}
+                    </span>
+                </td>
+                <td>${isLowStock ? '<span class="badge bg-warning">Low Stock</span>' : '<span class="badge bg-success">In Stock</span>'}</td>
+                <td>
+                    <button class="btn btn-sm btn-primary" onclick="editProduct(${p.product_id})" title="Edit">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-sm btn-danger" onclick="confirmDelete(${p.product_id})" title="Delete">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+    }).join('');
+}
+
+function editProduct(productId) {
+    const product = products.find(p => p.product_id === productId);
+    if (product) {
+        document.getElementById('productId').value = product.product_id;
+        document.getElementById('productName').value = product.product_name;
+        document.getElementById('productCategory').value = product.category_id || '';
+        document.getElementById('productBarcode').value = product.barcode || '';
+        document.getElementById('productPrice').value = product.price;
+        document.getElementById('productCostPrice').value = product.cost_price || '';
+        document.getElementById('productQuantity').value = product.quantity;
+        // Sent back so the server can tell a stock edit from a stale copy
+        document.getElementById('productQuantity').dataset.original = product.quantity;
+        document.getElementById('productThreshold').value = product.low_stock_threshold;
+        // Expiry is tracked per lot; on edit it only applies to stock being added
+        document.getElementById('productExpiry').value = '';
+        document.getElementById('productDescription').value = product.description || '';
+        
+        document.getElementById('productModalTitle').textContent = 'Edit Product';
+        new bootstrap.Modal(document.getElementById('productModal')).show();
+    }
+}
+
+function confirmDelete(productId) {
+    document.getElementById('deleteProductId').value = productId;
+    new bootstrap.Modal(document.getElementById('deleteModal')).show();
+}
+
+async function deleteProduct() {
+    const productId = document.getElementById('deleteProductId').value;
+    
+    try {
+        const response = await fetch(`/api/products/${productId}`, { method: 'DELETE' });
+        const data = await response.json();
+        
+        if (response.ok) {
+            bootstrap.Modal.getInstance(document.getElementById('deleteModal')).hide();
+            syncProducts();
+            showToast('Product deleted successfully', 'success');
+        } else {
+            showToast(data.error || 'Error deleting product', 'error');
+        }
+    } catch (error) {
+        showToast('Error deleting product', 'error');
+    }
+}
+
+async function saveProduct(e) {
+    e.preventDefault();
+    
+    const productId = document.getElementById('productId').value;
+    const productData = {
+        product_name: document.getElementById('productName').value,
+        category_id: document.getElementById('productCategory').value || null,
+        barcode: document.getElementById('productBarcode').value,
+        price: parseFloat(document.getElementById('productPrice').value),
+        cost_price: parseFloat(document.getElementById('productCostPrice').value) || 0,
+        quantity: parseInt(document.getElementById('productQuantity').value) || 0,
+        low_stock_threshold: parseInt(document.getElementById('productThreshold').value) || 10,
+        expiry_date: document.getElementById('productExpiry').value || null,
+        description: document.getElementById('productDescription').value
+    };
+    if (productId) {
+        productData.original_quantity = parseInt(document.getElementById('productQuantity').dataset.original);
+    }
+    
+    try {
+        const url = productId ? `/api/products/${productId}` : '/api/products';
+        const method = productId ? 'PUT' : 'POST';
+        
+        const response = await fetch(url, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(productData)
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            bootstrap.Modal.getInstance(document.getElementById('productModal')).hide();
+            syncProducts();
+            showToast('Product saved successfully', 'success');
+        } else {
+            if (response.status === 409) syncProducts();
+            showToast(data.error || 'Error saving product', 'error');
+        }
+    } catch (error) {
+        showToast('Error saving product', 'error');
+    }
+}
+
+function resetProductForm() {
+    document.getElementById('productForm').reset();
+    document.getElementById('productId').value = '';
+    delete document.getElementById('productQuantity').dataset.original;
+    document.getElementById('productModalTitle').textContent = 'Add New Product';
+}
@@ -306,6 +306,50 @@ const ExportHelper = {
     }
 };
 
+// Change feed: keeps local copies of products and customers in sync
+const ChangeFeed = {
+    version: 0,
+    
+    // Record the current version; call before loading the full lists
+    start: async function() {
+        const response = await fetch('/api/changes?since=0');
+        const data = await response.json();
+        ChangeFeed.version = data.version;
+    },
+    
+    // Fetch everything changed since the last sync. Returns null when the
+    // full lists have to be reloaded instead.
+    sync: async function() {
+        const changes = {
+            products: [], categories: [], customers: [], stock: [],
+            deleted: { products: [], categories: [], customers: [] }
+        };
+        let data;
+        
+        do {
+            const response = await fetch(`/api/changes?since=${ChangeFeed.version}`);
+            data = await response.json();
+            if (!response.ok || data.reset) {
+                return null;
+            }
+            
+            ['products', 'categories', 'customers', 'stock'].forEach(key => changes[key].push(...data[key]));
+            Object.keys(changes.deleted).forEach(key => changes.deleted[key].push(...data.deleted[key]));
+            ChangeFeed.version = data.version;
+        } while (data.has_more);
+        
+        return changes;
+    },
+    
+    // Merge changed rows into a local list and drop deleted ids
+    apply: function(list, rows, deletedIds, idKey) {
+        const byId = new Map(list.map(row => [row[idKey], row]));
+        rows.forEach(row => byId.set(row[idKey], row));
+        deletedIds.forEach(id => byId.delete(id));
+        return Array.from(byId.values());
+    }
+};
+
 // Initialize common functionality when DOM is ready
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Grocery Store Management System initialized');
@@ -336,3 +380,8 @@ window.API = API;
 window.TableHelper = TableHelper;
 window.FormValidator = FormValidator;
 window.ExportHelper = ExportHelper;
+window.ChangeFeed = ChangeFeed;
+
+// Page scripts call these helpers unqualified
+window.debounce = Utils.debounce;
+window.showToast = Utils.showToast;